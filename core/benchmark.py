@@ -0,0 +1,273 @@
+import argparse
+import copy
+import json
+import platform
+import time
+
+import callbacks
+from bitboard import popcount
+from endgame import EndgameSolver
+from game import Othello
+from perft import perft, perft_game
+from render import build_board_keyboard, create_board_string
+from search import Searcher
+from snapshots import decode_game, encode_game
+
+# (name, black, white, black to move) reached by fixed random playouts.
+POSITIONS = [
+    ('opening', 0x60c140400, 0x40301810200000, True),
+    ('early-midgame', 0x1018705896000000, 0x44042468bc2200, True),
+    ('midgame', 0x204f0b0c44f2c6a, 0x700c4e39304381, True),
+    ('late-midgame', 0x40f1f67070b04, 0xfcf9f0e098f82443, True),
+    ('endgame-20', 0x6830297c141e2700, 0x84c9d6828b810801, True),
+    ('endgame-12', 0x40f1f170f0f04, 0xfcf9f0e0a8f02041, True),
+]
+
+# Positions with at most this many empties are also solved exactly (without a
+# time limit), so the solver keeps a timing above the bot's own threshold.
+SOLVE_EMPTIES = 12
+
+DIRECTIONS = [(0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (-1, -1), (1, -1), (-1, 1)]
+
+
+def load_position(black, white, black_to_move):
+    game = Othello()
+    game.set_position(black, white, black_to_move)
+    return game
+
+
+class LegacySearch:
+    # The original get_ai_move search: plain minimax that deep-copies the
+    # emoji grid for every expanded node. Kept only as the benchmark baseline.
+    def __init__(self, game):
+        self.game = game
+        self.nodes = 0
+
+    def valid_moves(self, board, player):
+        game = self.game
+        opponent = game.get_opponent(player)
+        moves = []
+        for r in range(8):
+            for c in range(8):
+                if board[r][c] != game.empty_square:
+                    continue
+                for dr, dc in DIRECTIONS:
+                    rr, cc = r + dr, c + dc
+                    if 0 <= rr < 8 and 0 <= cc < 8 and board[rr][cc] == opponent:
+                        while 0 <= rr < 8 and 0 <= cc < 8:
+                            rr += dr
+                            cc += dc
+                            if not (0 <= rr < 8 and 0 <= cc < 8):
+                                break
+                            if board[rr][cc] == player:
+                                moves.append((r, c))
+                                break
+                            if board[rr][cc] == game.empty_square:
+                                break
+        return list(set(moves))
+
+    def simulate_move(self, board, move, player):
+        new_board = copy.deepcopy(board)
+        r, c = move
+        new_board[r][c] = player
+        opponent = self.game.get_opponent(player)
+        for dr, dc in DIRECTIONS:
+            rr, cc = r + dr, c + dc
+            tiles = []
+            while 0 <= rr < 8 and 0 <= cc < 8 and new_board[rr][cc] == opponent:
+                tiles.append((rr, cc))
+                rr += dr
+                cc += dc
+            if 0 <= rr < 8 and 0 <= cc < 8 and new_board[rr][cc] == player:
+                for tr, tc in tiles:
+                    new_board[tr][tc] = player
+        return new_board
+
+    def minimax(self, board, depth, player, maximizing):
+        self.nodes += 1
+        valid_moves = self.valid_moves(board, player)
+        if depth == 0 or not valid_moves:
+            return self.game.evaluate_board(board, self.game.current_player)
+
+        opponent = self.game.get_opponent(player)
+        scores = [
+            self.minimax(self.simulate_move(board, move, player), depth - 1, opponent, not maximizing)
+            for move in valid_moves
+        ]
+        return max(scores) if maximizing else min(scores)
+
+    def search(self, depth):
+        self.nodes = 0
+        return self.minimax(self.game.board, depth, self.game.current_player, True)
+
+
+def bench_legacy(game, depth):
+    search = LegacySearch(game)
+    start = time.perf_counter()
+    search.search(depth)
+    return search.nodes, time.perf_counter() - start
+
+
+def bench_perft(game, depth):
+    # Times the same count through the Othello API and on raw bitboards; a
+    # mismatch between the two is an engine bug, not a slow run.
+    own, opp = game._bitboards(game.current_player)
+    start = time.perf_counter()
+    leaves = perft(own, opp, depth)
+    bitboard_time = time.perf_counter() - start
+    start = time.perf_counter()
+    api_leaves = perft_game(game, depth)
+    api_time = time.perf_counter() - start
+    if api_leaves != leaves:
+        raise AssertionError(f"perft mismatch: Othello API {api_leaves}, bitboards {leaves}")
+    return leaves, bitboard_time, api_time
+
+
+def bench_search(game, depth):
+    searcher = Searcher(time_limit=0, max_depth=depth, endgame_empties=0)
+    own, opp = game._bitboards(game.current_player)
+    start = time.perf_counter()
+    searcher.search(own, opp)
+    return searcher.nodes, time.perf_counter() - start
+
+
+def bench_time_to_depth(game, max_depth):
+    # Seconds for iterative deepening to finish each depth, from a cold table.
+    own, opp = game._bitboards(game.current_player)
+    times = []
+    for depth in range(1, max_depth + 1):
+        searcher = Searcher(time_limit=0, max_depth=depth, endgame_empties=0)
+        start = time.perf_counter()
+        searcher.search(own, opp)
+        times.append(round(time.perf_counter() - start, 6))
+        if searcher.depth_reached < depth:
+            break
+    return times
+
+
+def bench_solve(game):
+    own, opp = game._bitboards(game.current_player)
+    solver = EndgameSolver(time_limit=0)
+    start = time.perf_counter()
+    solver.solve(own, opp)
+    return solver.nodes, time.perf_counter() - start
+
+
+def bench_make_unmake(game, repeat):
+    moves = game.get_valid_moves(game.current_player)
+    player = game.current_player
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for r, c in moves:
+            game.make_move(r, c, player)
+            game.undo_move()
+    return repeat * len(moves), time.perf_counter() - start
+
+
+def bench_render(game, repeat):
+    # Microseconds per call for what a bot update renders and serializes.
+    game_id = 0x12345678
+    compact = game.to_compact()
+    snapshot = encode_game(game, 'ai', [(1, 2)])
+    data = callbacks.encode(callbacks.MOVE, 'ai', game_id, 2, 3)
+    cases = {
+        'board_string': lambda: create_board_string(game, 'ai'),
+        'keyboard_json': lambda: build_board_keyboard(game, 'ai', game_id).to_json(),
+        'callback_encode': lambda: callbacks.encode(callbacks.MOVE, 'ai', game_id, 2, 3),
+        'callback_decode': lambda: callbacks.decode(data),
+        'snapshot_encode': lambda: encode_game(game, 'ai', [(1, 2)]),
+        'snapshot_decode': lambda: decode_game(snapshot),
+        'compact_load': lambda: game.set_position(*compact),
+    }
+    results = {}
+    for name, func in cases.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        results[name] = round((time.perf_counter() - start) / repeat * 1e6, 3)
+    return results
+
+
+def rate(nodes, elapsed):
+    return nodes / elapsed if elapsed else float('inf')
+
+
+def run_suite(args):
+    results = {}
+    for name, black, white, black_to_move in POSITIONS:
+        def position():
+            return load_position(black, white, black_to_move)
+
+        result = {'empties': 64 - popcount(black | white)}
+        leaves, bitboard_time, api_time = bench_perft(position(), args.perft_depth)
+        result['perft'] = {
+            'depth': args.perft_depth,
+            'leaves': leaves,
+            'nodes_per_s': round(rate(leaves, api_time)),
+            'bitboard_nodes_per_s': round(rate(leaves, bitboard_time)),
+        }
+        plies, make_time = bench_make_unmake(position(), args.repeat)
+        result['make_undo_per_s'] = round(rate(plies, make_time))
+        search_nodes, search_time = bench_search(position(), args.depth)
+        result['search'] = {'depth': args.depth, 'nodes': search_nodes, 'nodes_per_s': round(rate(search_nodes, search_time))}
+        if args.legacy:
+            legacy_nodes, legacy_time = bench_legacy(position(), args.depth)
+            result['legacy_nodes_per_s'] = round(rate(legacy_nodes, legacy_time))
+        result['time_to_depth'] = bench_time_to_depth(position(), args.max_depth)
+        if result['empties'] <= SOLVE_EMPTIES:
+            solve_nodes, solve_time = bench_solve(position())
+            result['solve'] = {'nodes': solve_nodes, 'seconds': round(solve_time, 6)}
+        result['render_us'] = bench_render(position(), args.repeat)
+        results[name] = result
+    return results
+
+
+def print_results(results):
+    print(
+        f"{'position':<15}{'perft leaves':>13}{'perft n/s':>12}{'bitboard n/s':>14}{'make/undo/s':>13}"
+        f"{'search n/s':>12}{'legacy n/s':>12}  time to depth (s)"
+    )
+    for name, result in results.items():
+        legacy = result.get('legacy_nodes_per_s')
+        depths = ' '.join(f"{seconds:.3f}" for seconds in result['time_to_depth'])
+        print(
+            f"{name:<15}{result['perft']['leaves']:>13,}{result['perft']['nodes_per_s']:>12,}"
+            f"{result['perft']['bitboard_nodes_per_s']:>14,}"
+            f"{result['make_undo_per_s']:>13,}{result['search']['nodes_per_s']:>12,}"
+            f"{'-' if legacy is None else f'{legacy:,}':>12}  {depths}"
+        )
+    for name, result in results.items():
+        if 'solve' in result:
+            print(f"{name}: exact solve {result['solve']['nodes']:,} nodes in {result['solve']['seconds']:.3f}s")
+
+    render = [result['render_us'] for result in results.values()]
+    print("render/serialize (us per call, mean over positions):")
+    for case in render[0]:
+        print(f"  {case:<16}{sum(r[case] for r in render) / len(render):>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark move generation, search and rendering on fixed positions.")
+    parser.add_argument('--depth', type=int, default=3, help="search depth for nodes/s")
+    parser.add_argument('--max-depth', type=int, default=6, help="deepest iteration for time to depth")
+    parser.add_argument('--perft-depth', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--legacy', action='store_true', help="also time the original deep-copy minimax")
+    parser.add_argument('--json', help="write results to this file for comparing runs")
+    args = parser.parse_args()
+
+    results = run_suite(args)
+    print_results(results)
+    if args.json:
+        report = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'settings': vars(args),
+            'positions': results,
+        }
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
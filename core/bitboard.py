@@ -0,0 +1,100 @@
+FULL = 0xFFFFFFFFFFFFFFFF
+NOT_A_FILE = 0xFEFEFEFEFEFEFEFE
+NOT_H_FILE = 0x7F7F7F7F7F7F7F7F
+
+# Square index is row * 8 + col, so bit 0 is the top-left corner (a1).
+START_BLACK = (1 << 28) | (1 << 35)
+START_WHITE = (1 << 27) | (1 << 36)
+
+# (shift, mask) pairs: positive shifts move towards higher squares. The mask
+# clears the bits that wrapped around to the opposite edge of the board.
+DIRECTIONS = (
+    (1, NOT_A_FILE),    # east
+    (-1, NOT_H_FILE),   # west
+    (8, FULL),          # south
+    (-8, FULL),         # north
+    (9, NOT_A_FILE),    # south-east
+    (-9, NOT_H_FILE),   # north-west
+    (7, NOT_H_FILE),    # south-west
+    (-7, NOT_A_FILE),   # north-east
+)
+
+
+STEPS = ((0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (-1, -1), (1, -1), (-1, 1))
+
+
+def square(row, col):
+    return row * 8 + col
+
+
+def _build_rays():
+    # RAYS[sq] holds, per direction, the square bits from sq out to the board
+    # edge. Rays shorter than two squares can never flip anything and are left out.
+    rays = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        square_rays = []
+        for dr, dc in STEPS:
+            ray = []
+            r, c = row + dr, col + dc
+            while 0 <= r < 8 and 0 <= c < 8:
+                ray.append(1 << square(r, c))
+                r, c = r + dr, c + dc
+            if len(ray) >= 2:
+                square_rays.append(tuple(ray))
+        rays.append(tuple(square_rays))
+    return tuple(rays)
+
+
+RAYS = _build_rays()
+# The first square of every ray: a move is only possible when one of these
+# holds an opponent disc.
+NEIGHBORS = tuple(sum(ray[0] for ray in square_rays) for square_rays in RAYS)
+
+
+def shift(bb, amount, mask):
+    if amount > 0:
+        return (bb << amount) & mask
+    return (bb >> -amount) & mask
+
+
+def popcount(bb):
+    return bb.bit_count()
+
+
+def iter_squares(bb):
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def get_moves(own, opp):
+    empty = ~(own | opp) & FULL
+    moves = 0
+    for amount, mask in DIRECTIONS:
+        line = shift(own, amount, mask) & opp
+        for _ in range(5):
+            line |= shift(line, amount, mask) & opp
+        moves |= shift(line, amount, mask) & empty
+    return moves
+
+
+def get_flips(own, opp, sq):
+    if (own | opp) >> sq & 1 or not NEIGHBORS[sq] & opp:
+        return 0
+    flips = 0
+    for ray in RAYS[sq]:
+        line = 0
+        for bit in ray:
+            if bit & opp:
+                line |= bit
+            else:
+                if bit & own:
+                    flips |= line
+                break
+    return flips
+
+
+def apply_move(own, opp, sq, flips):
+    return own | flips | (1 << sq), opp & ~flips
@@ -0,0 +1,241 @@
+import argparse
+import json
+import struct
+
+from bitboard import START_BLACK, START_WHITE, apply_move, get_flips, get_moves, popcount
+
+BOOK_PLIES = 16
+MIN_GAMES = 2
+SEARCH_PLIES = 4
+SEARCH_TIME_LIMIT = 1.0
+
+# Book file: magic, entry count, then entries sorted by key. Positions are
+# stored from the side to move's point of view, so one entry serves both colours.
+MAGIC = b'OBK1'
+_HEADER = struct.Struct('<4sI')
+_ENTRY = struct.Struct('<QQB')
+
+_REVERSED_BYTES = bytes(int(f'{byte:08b}'[::-1], 2) for byte in range(256))
+
+
+def flip_vertical(bb):
+    return int.from_bytes(bb.to_bytes(8, 'little'), 'big')
+
+
+def mirror_horizontal(bb):
+    return int.from_bytes(bb.to_bytes(8, 'little').translate(_REVERSED_BYTES), 'little')
+
+
+def transpose(bb):
+    # Swaps rows and columns with three delta swaps.
+    t = 0x0F0F0F0F00000000 & (bb ^ (bb << 28))
+    bb ^= t ^ (t >> 28)
+    t = 0x3333000033330000 & (bb ^ (bb << 14))
+    bb ^= t ^ (t >> 14)
+    t = 0x5500550055005500 & (bb ^ (bb << 7))
+    bb ^= t ^ (t >> 7)
+    return bb
+
+
+def _symmetry(index):
+    def apply(bb):
+        if index & 4:
+            bb = transpose(bb)
+        if index & 2:
+            bb = flip_vertical(bb)
+        if index & 1:
+            bb = mirror_horizontal(bb)
+        return bb
+    return apply
+
+
+SYMMETRIES = tuple(_symmetry(index) for index in range(8))
+# SQUARE_MAPS[s][sq] is where symmetry s sends square sq; UNMAPS undoes it.
+SQUARE_MAPS = tuple(tuple((sym(1 << sq)).bit_length() - 1 for sq in range(64)) for sym in SYMMETRIES)
+UNMAPS = tuple(tuple(mapping.index(sq) for sq in range(64)) for mapping in SQUARE_MAPS)
+
+
+def canonical(own, opp):
+    # The smallest of the eight symmetric images, and the symmetry giving it.
+    return min(((sym(own), sym(opp)), index) for index, sym in enumerate(SYMMETRIES))
+
+
+def parse_moves(text):
+    # Standard notation, e.g. "f5d6c3": column a-h, then row 1-8 from the top.
+    text = text.strip().lower()
+    if len(text) % 2:
+        raise ValueError(f"Odd-length move list: {text!r}")
+    moves = []
+    for i in range(0, len(text), 2):
+        col, row = text[i], text[i + 1]
+        if col not in 'abcdefgh' or row not in '12345678':
+            raise ValueError(f"Bad move {text[i:i + 2]!r}")
+        moves.append((int(row) - 1) * 8 + 'abcdefgh'.index(col))
+    return moves
+
+
+def format_moves(moves):
+    return ''.join('abcdefgh'[sq % 8] + str(sq // 8 + 1) for sq in moves)
+
+
+def replay(moves):
+    # Yields (own, opp, move, black_to_move) for each move of a game from the
+    # start, passing the turn whenever the side to move has no legal move.
+    own, opp, black_to_move = START_BLACK, START_WHITE, True
+    for sq in moves:
+        if not get_moves(own, opp):
+            own, opp, black_to_move = opp, own, not black_to_move
+        if not get_moves(own, opp) >> sq & 1:
+            raise ValueError(f"Illegal move {format_moves([sq])}")
+        yield own, opp, sq, black_to_move
+        own, opp = apply_move(own, opp, sq, get_flips(own, opp, sq))
+        own, opp, black_to_move = opp, own, not black_to_move
+
+
+class OpeningBook:
+    def __init__(self, entries=None):
+        # canonical (own, opp) -> move in the canonical frame
+        self.entries = entries if entries is not None else {}
+        self.max_discs = max((popcount(own | opp) for own, opp in self.entries), default=0)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, own, opp, sq):
+        key, index = canonical(own, opp)
+        self.entries[key] = SQUARE_MAPS[index][sq]
+        self.max_discs = max(self.max_discs, popcount(own | opp))
+
+    def lookup(self, own, opp):
+        if popcount(own | opp) > self.max_discs:
+            return None
+        key, index = canonical(own, opp)
+        move = self.entries.get(key)
+        if move is None:
+            return None
+        sq = UNMAPS[index][move]
+        return sq if get_moves(own, opp) >> sq & 1 else None
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, len(self.entries)))
+            for (own, opp), move in sorted(self.entries.items()):
+                f.write(_ENTRY.pack(own, opp, move))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, count = _HEADER.unpack_from(data)
+        if magic != MAGIC or len(data) != _HEADER.size + count * _ENTRY.size:
+            raise ValueError(f"{path} is not an opening book")
+        return cls({(own, opp): move for own, opp, move in _ENTRY.iter_unpack(data[_HEADER.size:])})
+
+
+def build_from_games(games, plies=BOOK_PLIES, min_games=MIN_GAMES):
+    # For every position in the first `plies` moves, keeps the move with the
+    # best average final disc difference for the player who made it, among
+    # moves played in at least min_games games.
+    results = {}
+    for moves in games:
+        positions = list(replay(moves))
+        if not positions:
+            continue
+        own, opp, sq, black_to_move = positions[-1]
+        own, opp = apply_move(own, opp, sq, get_flips(own, opp, sq))
+        black_lead = popcount(own) - popcount(opp) if black_to_move else popcount(opp) - popcount(own)
+        for own, opp, sq, black_to_move in positions[:plies]:
+            diff = black_lead if black_to_move else -black_lead
+            key, index = canonical(own, opp)
+            move_stats = results.setdefault(key, {}).setdefault(SQUARE_MAPS[index][sq], [0, 0])
+            move_stats[0] += 1
+            move_stats[1] += diff
+
+    entries = {}
+    for key, moves in results.items():
+        played = [(total / count, move) for move, (count, total) in moves.items() if count >= min_games]
+        if played:
+            entries[key] = max(played)[1]
+    return OpeningBook(entries)
+
+
+def build_from_search(plies=SEARCH_PLIES, time_limit=SEARCH_TIME_LIMIT, progress=None):
+    # Searches every position reachable in `plies` moves (symmetric ones
+    # once) and stores the searched move, so the bot can answer any opening
+    # line that deep without searching.
+    from search import Searcher  # search consults the book, so import late
+
+    book = OpeningBook()
+    frontier = [(START_BLACK, START_WHITE)]
+    seen = {canonical(START_BLACK, START_WHITE)[0]}
+    for _ in range(plies):
+        next_frontier = []
+        for own, opp in frontier:
+            moves = get_moves(own, opp)
+            if not moves:
+                continue
+            book.add(own, opp, Searcher(time_limit).search(own, opp))
+            if progress:
+                progress(len(book))
+            for sq in range(64):
+                if moves >> sq & 1:
+                    new_own, new_opp = apply_move(own, opp, sq, get_flips(own, opp, sq))
+                    key = canonical(new_opp, new_own)[0]
+                    if key not in seen:
+                        seen.add(key)
+                        next_frontier.append((new_opp, new_own))
+        frontier = next_frontier
+    return book
+
+
+def read_games(path):
+    # One game per line: a move string, or a JSON object with a "moves" string.
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                line = json.loads(line)['moves']
+            yield parse_moves(line)
+
+
+_shared_books = {}
+
+
+def shared_book(path):
+    # One book per process and path; a missing or unreadable file gives an
+    # empty book so the AI simply searches.
+    book = _shared_books.get(path)
+    if book is None:
+        try:
+            book = OpeningBook.load(path)
+        except (OSError, ValueError, struct.error):
+            book = OpeningBook()
+        _shared_books[path] = book
+    return book
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an opening book from recorded games or by searching.")
+    parser.add_argument('output')
+    parser.add_argument('--games', help="file with one game per line (move string or JSON with 'moves')")
+    parser.add_argument('--plies', type=int, help="book depth in moves")
+    parser.add_argument('--min-games', type=int, default=MIN_GAMES)
+    parser.add_argument('--time-limit', type=float, default=SEARCH_TIME_LIMIT, help="seconds per searched position")
+    args = parser.parse_args()
+
+    if args.games:
+        book = build_from_games(read_games(args.games), args.plies or BOOK_PLIES, args.min_games)
+    else:
+        book = build_from_search(
+            args.plies or SEARCH_PLIES, args.time_limit,
+            progress=lambda n: print(f"\r{n} positions searched", end='', flush=True)
+        )
+        print()
+    book.save(args.output)
+    print(f"Wrote {len(book)} positions to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,55 +1,388 @@
+import atexit
+import itertools
+import multiprocessing
 import os
+import random
+import secrets
+import signal
 import telebot
-import json
-import uuid
+import threading
 import time
-from telebot import types
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlsplit
+from telebot import apihelper, types
+import callbacks
+from dispatcher import Dispatcher, pooled_session
 from game import Othello
+from matchmaking import DEFAULT_RATING, Matchmaker, Ticket
+from metrics import Metrics
+from render import BoardRenderer, create_board_string
+from scheduler import Scheduler
+from search import MAX_DEPTH, search_position
+from sessions import SessionRegistry
+from snapshots import SnapshotStore, decode_game, encode_game
+from stats import create_stats_store
+from webhook import WebhookServer
+from workers import ShardedExecutor
 
 TOKEN = os.environ.get("TELEGRAM_TOKEN")
 STATS_FILE = 'stats.json'
-bot = telebot.TeleBot(TOKEN)
+STATS_DB = os.environ.get("STATS_DB", "stats.db")
+STATS_BACKEND = os.environ.get("STATS_BACKEND", "sqlite")
+SNAPSHOT_DB = os.environ.get("SNAPSHOT_DB", "games.db")
+OPENING_BOOK = os.environ.get("OPENING_BOOK", "book.bin")
+AI_WORKERS = int(os.environ.get("AI_WORKERS", "2"))
+# Each AI worker keeps a transposition table per game across its moves;
+# AI_SHARED_TT=1 makes the games of a worker share one table instead.
+AI_SHARED_TT = os.environ.get("AI_SHARED_TT", "0") == "1"
+AI_TIME_LIMIT = float(os.environ.get("AI_TIME_LIMIT", "0.2"))
+# AI_TIME_LIMIT=0 searches exactly AI_MAX_DEPTH plies, the same way every run.
+AI_MAX_DEPTH = int(os.environ.get("AI_MAX_DEPTH", str(MAX_DEPTH)))
+if not AI_TIME_LIMIT and "AI_MAX_DEPTH" not in os.environ:
+    raise SystemExit("AI_TIME_LIMIT=0 needs AI_MAX_DEPTH, or every AI move searches to the end of the game")
+BOT_THREADS = int(os.environ.get("BOT_THREADS", "8"))
+GAME_WORKERS = int(os.environ.get("GAME_WORKERS", "8"))
+SEND_WORKERS = int(os.environ.get("SEND_WORKERS", "4"))
+SEND_CHAT_INTERVAL = float(os.environ.get("SEND_CHAT_INTERVAL", "1.0"))
+SEND_RATE = float(os.environ.get("SEND_RATE", "30"))
+TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL")
+GAME_TTL = int(os.environ.get("GAME_TTL", "3600"))
+CHALLENGE_TTL = int(os.environ.get("CHALLENGE_TTL", "600"))
+MAX_LIVE_GAMES = int(os.environ.get("MAX_LIVE_GAMES", "10000"))
+SWEEP_INTERVAL = 60
+QUEUE_TIMEOUT = int(os.environ.get("QUEUE_TIMEOUT", "300"))
+MATCHMAKING_INTERVAL = 5
+RATING_STEP = 20
+# Metrics are collected only when served on METRICS_PORT or logged every
+# METRICS_LOG_INTERVAL seconds.
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+METRICS_LOG_INTERVAL = int(os.environ.get("METRICS_LOG_INTERVAL", "0"))
+# With WEBHOOK_URL set, Telegram posts updates to it (a proxy forwards them
+# to WEBHOOK_HOST:WEBHOOK_PORT) instead of the bot long polling.
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL")
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.environ.get("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", "8443"))
+WEBHOOK_QUEUE = int(os.environ.get("WEBHOOK_QUEUE", "1000"))
+WEBHOOK_RECORD = os.environ.get("WEBHOOK_RECORD")
+# Webhook updates are refused with 503 while more game tasks than this wait.
+MAX_GAME_BACKLOG = int(os.environ.get("MAX_GAME_BACKLOG", "10000"))
+# With GAME_ID_SEED set, AI games get handles derived from the seed and their
+# board message instead of a random counter, so updates recorded with
+# WEBHOOK_RECORD can be replayed against a fresh process.
+GAME_ID_SEED = os.environ.get("GAME_ID_SEED")
+
+# Pacing delays (seconds) so the AI does not answer instantly. They run on the
+# scheduler, never by sleeping on a handler thread.
+BOARD_DELAY = float(os.environ.get("BOARD_DELAY", "0.5"))
+AI_MOVE_DELAY = float(os.environ.get("AI_MOVE_DELAY", "2.0"))
+PASS_DELAY = float(os.environ.get("PASS_DELAY", "1.0"))
+
+if TELEGRAM_API_URL:
+    apihelper.API_URL = TELEGRAM_API_URL
+# Polling and the sender threads share one pool of keep-alive connections.
+apihelper.session = pooled_session(SEND_WORKERS + BOT_THREADS)
+metrics = Metrics(enabled=bool(METRICS_PORT or METRICS_LOG_INTERVAL))
+
+
+def log_error(where, error):
+    metrics.inc('errors_total', where=where)
+    print(f"Error in {where}: {error}")
+
+
+def log_task_error(func, error):
+    log_error(getattr(func, '__name__', 'task'), error)
+
+
+# Webhook workers run handlers themselves so the bounded webhook queue is
+# the only buffer; polling hands them to telebot's thread pool.
+bot = telebot.TeleBot(TOKEN, threaded=not WEBHOOK_URL, num_threads=BOT_THREADS)
+scheduler = Scheduler(workers=BOT_THREADS, on_error=log_task_error)
+# Everything that touches a game runs on the worker owning its id, so a game
+# never sees two updates at once and needs no lock of its own. Like the
+# dispatcher below, its threads only run after start() in __main__, so
+# importing this module starts nothing.
+game_workers = ShardedExecutor(GAME_WORKERS, name='game', on_error=log_task_error)
+
+
+def log_send_error(method, kwargs, error):
+    # The message no longer shows what the renderer thinks it does.
+    if method == 'edit_message_text':
+        renderer.forget(kwargs['chat_id'], kwargs['message_id'], kwargs['inline_message_id'])
+    log_error(method, error)
+
+
+# Messages and edits go out through the dispatcher: rate limited per chat and
+# overall, with queued edits of one message merged and 429s retried.
+dispatcher = Dispatcher(
+    bot, workers=SEND_WORKERS, chat_interval=SEND_CHAT_INTERVAL, global_rate=SEND_RATE, on_error=log_send_error
+)
+renderer = BoardRenderer(dispatcher)
+
+
+SESSION_END_TEXT = {
+    'expired': "⌛ This game has expired.",
+    'evicted': "⌛ This game was closed because too many games are running.",
+}
+
+
+def on_session_removed(game_id, game, reason):
+    # Runs on the sweeper thread, or on whichever thread added a game, so the
+    # cleanup is handed to the game's worker like every other change to it.
+    game_workers.submit(game_id, end_removed_session, game_id, game, reason)
+
+
+def end_removed_session(game_id, game, reason):
+    if game_id in games:
+        # The handle already belongs to a new game, and so does its state.
+        return
+    sessions = drop_random_session(game_id, game)
+    snapshot_store.delete(game_id)
+    cancel_ai_job(game_id)
+    if pending_challenges.get(game.player1_id) == game_id:
+        pending_challenges.pop(game.player1_id, None)
+    close_boards(game, sessions, SESSION_END_TEXT.get(reason, SESSION_END_TEXT['expired']))
+
+
+def close_boards(game, sessions, text):
+    # Replaces the boards of a game that ended without a result, so their
+    # buttons stop offering moves.
+    text = f"{create_board_string(game, '')}\n\n{text}"
+    if sessions:
+        for side in ('black', 'white'):
+            renderer.finish(text, sessions[side]['chat_id'], sessions[side]['msg_id'])
+    elif getattr(game, 'board_message', None):
+        renderer.finish(text, *game.board_message)
+    elif getattr(game, 'inline_message_id', None):
+        renderer.finish(text, inline_message_id=game.inline_message_id)
+
+
+games = SessionRegistry(GAME_TTL, MAX_LIVE_GAMES, on_remove=on_session_removed)
+pending_challenges = {}
+game_handles = itertools.count(random.getrandbits(31))
+stats_store = create_stats_store(STATS_BACKEND, STATS_FILE, STATS_DB)
+snapshot_store = SnapshotStore(SNAPSHOT_DB)
+
+ai_executors = [None] * AI_WORKERS
+ai_executor_lock = threading.Lock()
+# Pools are (re)created while the bot's threads run, and forking a threaded
+# process can leave a lock held forever in the child. A forkserver starts
+# workers from a process without those threads; it imports this module as
+# __mp_main__, which is why nothing here starts before __main__.
+ai_context = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+ai_jobs = {}
+
+matchmaker = Matchmaker(timeout=QUEUE_TIMEOUT)
+random_games_sessions = {}
+# User id -> the random game they are playing, so they cannot queue again.
+random_players = {}
 
-games = {}
-user_stats = {}
 
-waiting_user = None
-random_games_sessions = {}
+def instrument_telegram():
+    # Times every Bot API request by method and counts failures by error
+    # code; only installed when metrics are enabled.
+    make_request = apihelper._make_request
+
+    def timed_request(token, method_name, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return make_request(token, method_name, *args, **kwargs)
+        except Exception as e:
+            code = str(getattr(e, 'error_code', 'network'))
+            metrics.inc('telegram_errors_total', method=method_name, code=code)
+            raise
+        finally:
+            metrics.observe('telegram_request_seconds', time.perf_counter() - start, method=method_name)
+
+    apihelper._make_request = timed_request
+
+
+def start_metrics():
+    metrics.gauge('live_games', lambda: len(games))
+    metrics.gauge('matchmaking_queue', lambda: len(matchmaker))
+    metrics.gauge('pending_game_tasks', game_workers.pending)
+    metrics.gauge('ai_jobs', lambda: len(ai_jobs))
+    metrics.counter('sessions_expired_total', lambda: games.metrics()['expired'])
+    metrics.counter('sessions_evicted_total', lambda: games.metrics()['evicted'])
+    metrics.gauge('outbox_pending', dispatcher.pending)
+    metrics.counter('outbox_sent_total', lambda: dispatcher.sent)
+    metrics.counter('outbox_coalesced_total', lambda: dispatcher.coalesced)
+    metrics.counter('outbox_retried_total', lambda: dispatcher.retried)
+    metrics.counter('outbox_failed_total', lambda: dispatcher.failed)
+    instrument_telegram()
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+        print(f"Metrics on http://127.0.0.1:{METRICS_PORT}/metrics")
+    if METRICS_LOG_INTERVAL:
+        scheduler.call_later(METRICS_LOG_INTERVAL, log_metrics)
+
+
+def log_metrics():
+    print(f"Metrics:\n{metrics.summary()}")
+    scheduler.call_later(METRICS_LOG_INTERVAL, log_metrics)
 
 
 def load_stats():
-    global user_stats
+    stats_store.load()
+    stats_store.start()
+    atexit.register(stats_store.close)
+
+
+def save_game(game_id, game, mode, message=None):
+    if mode == 'rnd':
+        sessions = random_games_sessions.get(game_id)
+        if not sessions:
+            return
+        refs = [(sessions[side]['chat_id'], sessions[side]['msg_id']) for side in ('black', 'white')]
+    elif mode == 'ai':
+        refs = [(message.chat.id, message.message_id)]
+    else:
+        refs = ()
+    snapshot_store.save(game_id, encode_game(game, mode, refs, getattr(game, 'inline_message_id', None)))
+
+
+def remove_game(game_id):
+    game = games.pop(game_id, None)
+    if game is not None:
+        drop_random_session(game_id, game)
+    snapshot_store.delete(game_id)
+
+
+def drop_random_session(game_id, game):
+    for user_id in (game.player1_id, game.player2_id):
+        if random_players.get(user_id) == game_id:
+            random_players.pop(user_id, None)
+    return random_games_sessions.pop(game_id, None)
+
+
+def restore_games():
+    for game_id, state in snapshot_store.load().items():
+        try:
+            game, mode, refs, inline_message_id = decode_game(state)
+        except ValueError as e:
+            print(f"Dropping game snapshot {game_id}: {e}")
+            snapshot_store.delete(game_id)
+            continue
+
+        if inline_message_id:
+            game.inline_message_id = inline_message_id
+        if mode == '2p' and game.player2_id is None:
+            games.add(game_id, game, ttl=CHALLENGE_TTL)
+            pending_challenges[game.player1_id] = game_id
+            continue
+        games.add(game_id, game)
+        if mode == 'ai' and refs:
+            game.board_message = refs[0]
+        if mode == 'rnd':
+            (black_chat, black_msg), (white_chat, white_msg) = refs
+            random_games_sessions[game_id] = {
+                'black': {'chat_id': black_chat, 'msg_id': black_msg},
+                'white': {'chat_id': white_chat, 'msg_id': white_msg}
+            }
+            random_players[game.player1_id] = game_id
+            random_players[game.player2_id] = game_id
+        elif mode == 'ai' and game.current_player == game.player_white:
+            # The AI reply was lost with the old process; ask for it again.
+            chat_id, message_id = refs[0]
+            message = types.Message.de_json(
+                {'message_id': message_id, 'date': 0, 'chat': {'id': chat_id, 'type': 'private'}}
+            )
+            game_workers.submit(game_id, process_game_turn_ai, game_id, message)
+    if len(games):
+        print(f"Restored {len(games)} games from {SNAPSHOT_DB}")
+
+
+def load_games():
+    restore_games()
+    snapshot_store.start()
+    atexit.register(snapshot_store.close)
+
+
+def new_game_id(chat_id=None, message_id=None):
+    # Short integer handles keep callback_data compact. The counter starts at
+    # a random point so buttons from before a restart rarely hit a new game.
+    if GAME_ID_SEED is not None and chat_id is not None:
+        game_id = callbacks.seeded_handle(GAME_ID_SEED, chat_id, message_id)
+        if game_id not in games:
+            return game_id
+    while True:
+        game_id = next(game_handles) & 0xFFFFFFFF
+        if game_id not in games:
+            return game_id
+
+
+def sweep_sessions():
+    if games.sweep():
+        print(f"Game sessions: {games.metrics()}")
+    scheduler.call_later(SWEEP_INTERVAL, sweep_sessions)
+
+
+def get_ai_executor(game_id):
+    # A game's searches always run in the same single-process pool, so the
+    # process still has the game's table from its previous move.
+    shard = hash(game_id) % AI_WORKERS
+    with ai_executor_lock:
+        if ai_executors[shard] is None:
+            ai_executors[shard] = ProcessPoolExecutor(max_workers=1, mp_context=ai_context)
+        return ai_executors[shard]
+
+
+def reset_ai_executor(broken):
+    # A dying worker (OOM kill, crash) breaks its pool for good, so drop it
+    # and let the next search start a fresh one.
+    with ai_executor_lock:
+        for shard, executor in enumerate(ai_executors):
+            if executor is broken:
+                ai_executors[shard] = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def submit_ai_search(game_id, game):
+    args = game.to_compact()
+    options = {
+        'time_limit': AI_TIME_LIMIT, 'max_depth': AI_MAX_DEPTH, 'book_path': OPENING_BOOK, 'with_stats': True,
+        'game_id': game_id, 'shared_tt': AI_SHARED_TT,
+    }
+    executor = get_ai_executor(game_id)
     try:
-        with open(STATS_FILE, 'r') as f:
-            user_stats = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        user_stats = {}
+        return executor.submit(search_position, *args, **options)
+    except BrokenProcessPool:
+        reset_ai_executor(executor)
+        return get_ai_executor(game_id).submit(search_position, *args, **options)
 
 
-def save_stats():
-    with open(STATS_FILE, 'w') as f:
-        json.dump(user_stats, f, indent=4)
+def cancel_ai_job(game_id):
+    job = ai_jobs.pop(game_id, None)
+    if job:
+        job.cancel()
 
 
 def update_stats(user_id, result):
-    user_id = str(user_id)
-    if user_id not in user_stats:
-        user_stats[user_id] = {'win': 0, 'loss': 0, 'draw': 0, 'total': 0}
-    user_stats[user_id][result] += 1
-    user_stats[user_id]['total'] += 1
-    save_stats()
+    stats_store.record(user_id, result)
 
 
 @bot.inline_handler(lambda query: True)
 def inline_query_handler(inline_query):
     try:
         user = inline_query.from_user
-        game_id = str(uuid.uuid4())
-        games[game_id] = Othello(player1_id=user.id, player1_name=user.first_name)
+        # Inline queries arrive on every keystroke, so an unaccepted challenge
+        # from the same user is reused instead of creating a new game each time.
+        game_id = pending_challenges.get(user.id)
+        if game_id is None or not games.touch(game_id):
+            game_id = new_game_id()
+            game = Othello(player1_id=user.id, player1_name=user.first_name)
+            games.add(game_id, game, ttl=CHALLENGE_TTL)
+            pending_challenges[user.id] = game_id
+            save_game(game_id, game, '2p')
         markup = types.InlineKeyboardMarkup()
-        markup.add(types.InlineKeyboardButton("🤝 Accept Challenge", callback_data=f"accept_{game_id}"))
+        markup.add(types.InlineKeyboardButton(
+            "🤝 Accept Challenge", callback_data=callbacks.encode(callbacks.ACCEPT, game_id=game_id)
+        ))
         response = types.InlineQueryResultArticle(
-            id=game_id,
+            id=str(game_id),
             title="🎲 Othello Game Challenge",
             description=f"{user.first_name} has invited you to play. Tap to join.",
             reply_markup=markup,
@@ -59,33 +392,34 @@ def inline_query_handler(inline_query):
         )
         bot.answer_inline_query(inline_query.id, [response], cache_time=1)
     except Exception as e:
-        print(f"Error in inline_query_handler: {e}")
+        log_error('inline_query_handler', e)
 
 
 @bot.message_handler(commands=['start'])
 def start_command(message):
     markup = types.ReplyKeyboardMarkup(row_width=2, resize_keyboard=True)
     markup.add(types.KeyboardButton('🎲 New Game'), types.KeyboardButton('📊 My Stats'))
-    bot.send_message(message.chat.id, "Welcome to Othello! ⚫️⚪️", reply_markup=markup)
+    dispatcher.send_message(message.chat.id, "Welcome to Othello! ⚫️⚪️", reply_markup=markup)
 
 
 @bot.message_handler(func=lambda message: message.text == '🎲 New Game')
 def new_game_handler(message):
     markup = types.InlineKeyboardMarkup()
-    btn1 = types.InlineKeyboardButton("🎮 Play vs AI", callback_data='vs_ai')
-    btn_random = types.InlineKeyboardButton("⚔️ Random Opponent", callback_data='random_queue')
+    btn1 = types.InlineKeyboardButton("🎮 Play vs AI", callback_data=callbacks.encode(callbacks.VS_AI))
+    btn_random = types.InlineKeyboardButton(
+        "⚔️ Random Opponent", callback_data=callbacks.encode(callbacks.RANDOM_QUEUE)
+    )
     btn2 = types.InlineKeyboardButton("🤝 Play with a Friend", switch_inline_query='')
     markup.row(btn1)
     markup.row(btn_random)
     markup.row(btn2)
-    bot.send_message(message.chat.id, "Choose your opponent:", reply_markup=markup)
+    dispatcher.send_message(message.chat.id, "Choose your opponent:", reply_markup=markup)
 
 
 @bot.message_handler(func=lambda message: message.text == '📊 My Stats')
 def show_history_handler(message):
-    user_id = str(message.from_user.id)
-    if user_id in user_stats and user_stats[user_id]['total'] > 0:
-        stats = user_stats[user_id]
+    stats = stats_store.get(message.from_user.id)
+    if stats and stats['total'] > 0:
         reply = (
             f"📈 Your Game Statistics:\n\n"
             f"Total games: {stats['total']}\n"
@@ -95,64 +429,109 @@ def show_history_handler(message):
         )
     else:
         reply = "You haven't played any games yet."
-    bot.send_message(message.chat.id, reply)
+    dispatcher.send_message(message.chat.id, reply)
 
 
 @bot.callback_query_handler(func=lambda call: True)
 def main_callback_handler(call):
-    if call.data == 'vs_ai':
-        start_ai_game(call)
-    elif call.data == 'random_queue':
-        handle_random_queue(call)
-    elif call.data.startswith('accept_'):
-        accept_2p_game(call)
-    elif call.data.startswith('move_'):
-        handle_player_move(call)
-    elif call.data.startswith('forfeit_'):
-        handle_forfeit(call)
-
-
-def handle_random_queue(call):
-    global waiting_user
+    data = callbacks.decode(call.data or '')
+    handler = CALLBACK_HANDLERS.get(data.action) if data else None
+    if handler is None:
+        bot.answer_callback_query(call.id, "This button is no longer valid.", show_alert=True)
+        return
+    # Buttons without a game (new game, queue) are serialized per user instead.
+    key = data.game_id if data.game_id else ('user', call.from_user.id)
+    game_workers.submit(key, run_handler, handler, call, data, time.perf_counter())
+
+
+def run_handler(handler, call, data, queued):
+    metrics.observe('handler_queue_seconds', time.perf_counter() - queued)
+    with metrics.timer('handler_seconds', handler=handler.__name__):
+        try:
+            handler(call, data)
+        except Exception as e:
+            log_error(handler.__name__, e)
+
+
+def player_rating(user_id):
+    stats = stats_store.get(user_id)
+    if not stats:
+        return None
+    return DEFAULT_RATING + RATING_STEP * (stats['win'] - stats['loss'])
+
+
+def handle_random_queue(call, data):
     user = call.from_user
     chat_id = call.message.chat.id
     message_id = call.message.message_id
 
-    if waiting_user and waiting_user['id'] == user.id:
-        waiting_user = None
-        bot.edit_message_text("❌ You left the queue.", chat_id, message_id)
+    if user.id in random_players:
+        bot.answer_callback_query(call.id, "You are already playing a game.", show_alert=True)
+        return
+    if matchmaker.is_queued(user.id):
+        bot.answer_callback_query(call.id, "You are already searching for an opponent.")
         return
 
-    if waiting_user is None:
-        waiting_user = {
-            'id': user.id,
-            'name': user.first_name,
-            'chat_id': chat_id,
-            'message_id': message_id
-        }
-        markup = types.InlineKeyboardMarkup()
-        markup.add(types.InlineKeyboardButton("❌ Cancel Search", callback_data="random_queue"))
-        bot.edit_message_text(
-            "🔍 Searching for an opponent...\n\nPlease wait for someone else to join.",
-            chat_id, message_id, reply_markup=markup
-        )
+    # Show the searching message before queueing, so a match made by another
+    # thread can never be overwritten by it.
+    markup = types.InlineKeyboardMarkup()
+    markup.add(types.InlineKeyboardButton(
+        "❌ Cancel Search", callback_data=callbacks.encode(callbacks.RANDOM_CANCEL)
+    ))
+    dispatcher.edit_message_text(
+        "🔍 Searching for an opponent...\n\nPlease wait for someone else to join.",
+        chat_id, message_id, reply_markup=markup
+    )
+
+    ticket = Ticket(user.id, user.first_name, chat_id, message_id, player_rating(user.id))
+    opponent = matchmaker.enqueue(ticket)
+    if opponent is not None:
+        start_random_game(opponent, ticket)
+
+
+def handle_random_cancel(call, data):
+    # Only ever cancels: if the player was matched a moment ago, this message
+    # is already their board and must not be edited.
+    if matchmaker.cancel(call.from_user.id):
+        dispatcher.edit_message_text("❌ You left the queue.", call.message.chat.id, call.message.message_id)
+        bot.answer_callback_query(call.id)
     else:
-        opponent = waiting_user
-        waiting_user = None
-
-        game_id = str(uuid.uuid4())
-        games[game_id] = Othello(
-            player1_id=opponent['id'],
-            player1_name=opponent['name'],
-            player2_id=user.id,
-            player2_name=user.first_name
-        )
+        bot.answer_callback_query(call.id, "You are no longer searching.")
 
-        random_games_sessions[game_id] = {
-            'black': {'chat_id': opponent['chat_id'], 'msg_id': opponent['message_id']},
-            'white': {'chat_id': chat_id, 'msg_id': message_id}
-        }
-        update_board_random(game_id)
+
+def start_random_game(black, white):
+    game_id = new_game_id()
+    games[game_id] = Othello(
+        player1_id=black.user_id,
+        player1_name=black.name,
+        player2_id=white.user_id,
+        player2_name=white.name
+    )
+
+    random_games_sessions[game_id] = {
+        'black': {'chat_id': black.chat_id, 'msg_id': black.message_id},
+        'white': {'chat_id': white.chat_id, 'msg_id': white.message_id}
+    }
+    random_players[black.user_id] = game_id
+    random_players[white.user_id] = game_id
+    save_game(game_id, games.get(game_id), 'rnd')
+    game_workers.submit(game_id, update_board_random, game_id)
+
+
+def sweep_matchmaking():
+    matches, timed_out = matchmaker.sweep()
+    for black, white in matches:
+        start_random_game(black, white)
+    for ticket in timed_out:
+        markup = types.InlineKeyboardMarkup()
+        markup.add(types.InlineKeyboardButton(
+            "⚔️ Search Again", callback_data=callbacks.encode(callbacks.RANDOM_QUEUE)
+        ))
+        dispatcher.edit_message_text(
+            "⌛ No opponent was found. Please try again later.",
+            ticket.chat_id, ticket.message_id, reply_markup=markup
+        )
+    scheduler.call_later(MATCHMAKING_INTERVAL, sweep_matchmaking)
 
 
 def update_board_random(game_id):
@@ -161,17 +540,9 @@ def update_board_random(game_id):
     if not game or not sessions: return
 
     text = create_board_string(game, "rnd")
-    markup = create_board_keyboard(game, "rnd", game_id)
-
-    try:
-        bot.edit_message_text(text, sessions['black']['chat_id'], sessions['black']['msg_id'], reply_markup=markup)
-    except:
-        pass
-
-    try:
-        bot.edit_message_text(text, sessions['white']['chat_id'], sessions['white']['msg_id'], reply_markup=markup)
-    except:
-        pass
+    markup = renderer.keyboard(game, "rnd", game_id)
+    for side in ('black', 'white'):
+        renderer.edit(text, sessions[side]['chat_id'], sessions[side]['msg_id'], reply_markup=markup)
 
 
 def check_game_over_random(game_id):
@@ -198,41 +569,37 @@ def check_game_over_random(game_id):
             update_stats(game.player2_id, 'draw')
 
         final_text = f"{create_board_string(game, '')}\n\n--- Game Over ---\n{result_text}"
+        if sessions:
+            for side in ('black', 'white'):
+                renderer.finish(final_text, sessions[side]['chat_id'], sessions[side]['msg_id'])
 
-        try:
-            bot.edit_message_text(final_text, sessions['black']['chat_id'], sessions['black']['msg_id'],
-                                  reply_markup=None)
-            bot.edit_message_text(final_text, sessions['white']['chat_id'], sessions['white']['msg_id'],
-                                  reply_markup=None)
-        except:
-            pass
-
-        games.pop(game_id, None)
-        random_games_sessions.pop(game_id, None)
+        remove_game(game_id)
         return True
     return False
 
-def start_ai_game(call):
+def start_ai_game(call, data):
     chat_id = call.message.chat.id
     user = call.from_user
-    game_id = str(chat_id)
-    games[game_id] = Othello(
+    game_id = new_game_id(chat_id, call.message.message_id)
+    game = Othello(
         player1_id=user.id,
         player1_name=user.first_name,
         player2_name="AI"
     )
+    game.board_message = (chat_id, call.message.message_id)
+    games[game_id] = game
+    save_game(game_id, game, 'ai', call.message)
     bot.answer_callback_query(call.id)
-    bot.edit_message_text(
+    dispatcher.edit_message_text(
         f"Game started vs AI! You are {user.first_name} (⚫️).",
         chat_id,
         call.message.message_id
     )
-    time.sleep(0.5)
-    send_board_single_player(game_id, call.message)
+    scheduler.call_later(BOARD_DELAY, game_workers.submit, game_id, send_board_single_player, game_id, call.message)
 
 
-def accept_2p_game(call):
-    game_id = call.data.split('_')[1]
+def accept_2p_game(call, data):
+    game_id = data.game_id
     game = games.get(game_id)
     user = call.from_user
 
@@ -249,17 +616,16 @@ def accept_2p_game(call):
     game.player2_id = user.id
     game.player2_name = user.first_name
     game.inline_message_id = call.inline_message_id
+    games.touch(game_id, ttl=GAME_TTL)
+    if pending_challenges.get(game.player1_id) == game_id:
+        pending_challenges.pop(game.player1_id)
+    save_game(game_id, game, '2p')
     bot.answer_callback_query(call.id, "You have accepted the challenge!")
     update_board_two_player(game_id)
 
 
-def handle_forfeit(call):
-    try:
-        _, mode, game_id = call.data.split('_')
-    except ValueError:
-        bot.answer_callback_query(call.id, "Error processing.", show_alert=True)
-        return
-
+def handle_forfeit(call, data):
+    mode, game_id = data.mode, data.game_id
     game = games.get(game_id)
     forfeiting_user = call.from_user
 
@@ -268,6 +634,7 @@ def handle_forfeit(call):
         return
 
     update_stats(forfeiting_user.id, 'loss')
+    cancel_ai_job(game_id)
 
     if mode == 'rnd':
         sessions = random_games_sessions.get(game_id)
@@ -276,13 +643,10 @@ def handle_forfeit(call):
         update_stats(winner_id, 'win')
 
         final_txt = f"🏳️ {forfeiting_user.first_name} surrendered.\n🎉 {winner_name} Wins!"
-        try:
-            bot.edit_message_text(final_txt, sessions['black']['chat_id'], sessions['black']['msg_id'], reply_markup=None)
-            bot.edit_message_text(final_txt, sessions['white']['chat_id'], sessions['white']['msg_id'], reply_markup=None)
-        except:
-            pass
-        games.pop(game_id, None)
-        random_games_sessions.pop(game_id, None)
+        if sessions:
+            for side in ('black', 'white'):
+                renderer.finish(final_txt, sessions[side]['chat_id'], sessions[side]['msg_id'])
+        remove_game(game_id)
         return
 
     if mode == 'ai':
@@ -306,23 +670,19 @@ def handle_forfeit(call):
     full_final_text = f"--- Game Over ---\n{final_text}"
 
     if mode == 'ai':
-        bot.edit_message_text(full_final_text, call.message.chat.id, call.message.message_id, reply_markup=None)
+        renderer.finish(full_final_text, call.message.chat.id, call.message.message_id)
     elif hasattr(game, 'inline_message_id'):
-        bot.edit_message_text(full_final_text, inline_message_id=game.inline_message_id, reply_markup=None)
+        renderer.finish(full_final_text, inline_message_id=game.inline_message_id)
 
-    games.pop(game_id, None)
+    remove_game(game_id)
     bot.answer_callback_query(call.id, "You have Surrendered.")
 
 
-def handle_player_move(call):
-    try:
-        _, mode, game_id, r_str, c_str = call.data.split('_')
-        r, c = int(r_str), int(c_str)
-    except ValueError:
-        return
-
+def handle_player_move(call, data):
+    mode, game_id, r, c = data.mode, data.game_id, data.row, data.col
     game = games.get(game_id)
     if not game:
+        bot.answer_callback_query(call.id, "This game has expired.", show_alert=True)
         return
 
     user_id = call.from_user.id
@@ -331,8 +691,10 @@ def handle_player_move(call):
         current_player_id = game.get_current_player_id()
     elif mode == '2p':
         current_player_id = game.get_current_player_id()
-    else:
+    elif game.current_player == game.player_black:
         current_player_id = user_id
+    else:
+        current_player_id = None
 
     if user_id != current_player_id:
         bot.answer_callback_query(call.id, "⏳ It's not your turn!", show_alert=True)
@@ -350,11 +712,13 @@ def handle_player_move(call):
                     return
 
             if not check_game_over_random(game_id):
+                save_game(game_id, game, mode)
                 update_board_random(game_id)
         else:
             if not game.get_valid_moves(game.current_player):
                 game.current_player = game.get_opponent(game.current_player)
             if not check_game_over(game_id):
+                save_game(game_id, game, mode)
                 update_board_two_player(game_id)
     else:
         bot.answer_callback_query(call.id, "❌ Invalid move!", show_alert=True)
@@ -362,31 +726,81 @@ def handle_player_move(call):
 
 def process_game_turn_ai(game_id, message):
     game = games.get(game_id)
-    chat_id = message.chat.id
+    if not game:
+        return
 
+    save_game(game_id, game, 'ai', message)
     send_board_single_player(game_id, message)
-    time.sleep(1)
 
     if game.current_player == game.player_white:
         if check_game_over(game_id, message=message):
             return
-        time.sleep(1.0)
-        ai_move = game.get_ai_move()
-        if ai_move:
-            game.make_move(ai_move[0], ai_move[1], game.player_white)
-        else:
-            game.current_player = game.player_black
+        request_ai_move(game_id, message)
+        return
+
+    finish_ai_turn(game_id, message)
+
+
+def request_ai_move(game_id, message):
+    game = games.get(game_id)
+    started = time.monotonic()
+    try:
+        job = submit_ai_search(game_id, game)
+    except BrokenProcessPool as e:
+        # A failed job makes apply_ai_move search in this process instead.
+        log_error('ai_executor', e)
+        job = Future()
+        job.set_exception(e)
+    ai_jobs[game_id] = job
+    job.add_done_callback(lambda done: ai_move_ready(game_id, game, message, done, started))
+
+
+def ai_move_ready(game_id, game, message, job, started):
+    elapsed = time.monotonic() - started
+    if not job.cancelled():
+        metrics.observe('ai_move_seconds', elapsed)
+    scheduler.call_later(
+        max(0.0, AI_MOVE_DELAY - elapsed), game_workers.submit, game_id, apply_ai_move, game_id, game, message, job
+    )
+
+
+def apply_ai_move(game_id, game, message, job):
+    if ai_jobs.get(game_id) is job:
+        ai_jobs.pop(game_id)
+    if job.cancelled() or games.get(game_id) is not game:
+        return
+
+    try:
+        ai_move, search_stats = job.result()
+        metrics.inc('ai_search_nodes_total', search_stats['nodes'])
+        source = 'book' if search_stats['book'] else 'solver' if search_stats['solved'] else 'search'
+        metrics.inc('ai_moves_total', source=source)
+    except Exception as e:
+        log_error('ai_search', e)
+        ai_move = game.get_ai_move(AI_TIME_LIMIT, AI_MAX_DEPTH, book_path=OPENING_BOOK)
+
+    if ai_move:
+        game.make_move(ai_move[0], ai_move[1], game.player_white)
+    else:
+        game.current_player = game.player_black
 
-        send_board_single_player(game_id, message)
+    save_game(game_id, game, 'ai', message)
+    send_board_single_player(game_id, message)
+    finish_ai_turn(game_id, message)
+
+
+def finish_ai_turn(game_id, message):
+    game = games.get(game_id)
+    chat_id = message.chat.id
 
     if check_game_over(game_id, message=message):
         return
 
     if not game.get_valid_moves(game.player_black):
-        bot.send_message(chat_id, "You have no valid moves! Turn passed to the AI.")
+        dispatcher.send_message(chat_id, "You have no valid moves! Turn passed to the AI.")
         game.current_player = game.player_white
-        time.sleep(1)
-        process_game_turn_ai(game_id, message)
+        save_game(game_id, game, 'ai', message)
+        scheduler.call_later(PASS_DELAY, game_workers.submit, game_id, process_game_turn_ai, game_id, message)
 
 
 def update_board_two_player(game_id):
@@ -394,11 +808,8 @@ def update_board_two_player(game_id):
     if not game or not hasattr(game, 'inline_message_id'):
         return
     text = create_board_string(game, "2p")
-    markup = create_board_keyboard(game, "2p", game_id)
-    try:
-        bot.edit_message_text(text, inline_message_id=game.inline_message_id, reply_markup=markup)
-    except Exception as e:
-        if 'message is not modified' not in str(e): print(e)
+    markup = renderer.keyboard(game, "2p", game_id)
+    renderer.edit(text, inline_message_id=game.inline_message_id, reply_markup=markup)
 
 
 def send_board_single_player(game_id, message):
@@ -406,11 +817,8 @@ def send_board_single_player(game_id, message):
     if not game:
         return
     text = create_board_string(game, "ai")
-    markup = create_board_keyboard(game, "ai", game_id)
-    try:
-        bot.edit_message_text(text, message.chat.id, message.message_id, reply_markup=markup)
-    except Exception as e:
-        print(f"Error updating AI board: {e}")
+    markup = renderer.keyboard(game, "ai", game_id)
+    renderer.edit(text, message.chat.id, message.message_id, reply_markup=markup)
 
 
 def check_game_over(game_id, message=None):
@@ -439,69 +847,82 @@ def check_game_over(game_id, message=None):
         final_text = f"{create_board_string(game, '')}\n\n--- Game Over ---\n{result_text}"
 
         if message:
-            bot.edit_message_text(final_text, message.chat.id, message.message_id, reply_markup=None)
+            renderer.finish(final_text, message.chat.id, message.message_id)
         elif hasattr(game, 'inline_message_id'):
-            bot.edit_message_text(final_text, inline_message_id=game.inline_message_id, reply_markup=None)
+            renderer.finish(final_text, inline_message_id=game.inline_message_id)
 
-        games.pop(game_id, None)
+        remove_game(game_id)
         return True
     return False
 
 
-def create_board_string(game, mode):
-    score = game.get_score()
-    p1_score = score.get(game.player_black, 0)
-    p2_score = score.get(game.player_white, 0)
-
-    if mode in ["ai", "2p", "rnd"]:
-        current_player_name = game.get_current_player_name() or "Player"
-        turn_text = f"{current_player_name}'s turn ({game.current_player})"
-    else:
-        turn_text = ""
-
-    return f"Score: ⚫️ {p1_score} - {p2_score} ⚪️\n{turn_text}"
+CALLBACK_HANDLERS = {
+    callbacks.VS_AI: start_ai_game,
+    callbacks.RANDOM_QUEUE: handle_random_queue,
+    callbacks.RANDOM_CANCEL: handle_random_cancel,
+    callbacks.ACCEPT: accept_2p_game,
+    callbacks.MOVE: handle_player_move,
+    callbacks.FORFEIT: handle_forfeit,
+}
 
 
-def create_board_keyboard(game, mode, game_id):
-    markup = types.InlineKeyboardMarkup(row_width=8)
-    valid_moves = []
-
-    is_my_turn = False
-    if mode == 'ai':
-        is_my_turn = (game.current_player == game.player_black)
-    else:
-        is_my_turn = True
-
-    if is_my_turn:
-        valid_moves = game.get_valid_moves(game.current_player)
-
-    buttons = []
-    for r in range(game.board_size):
-        row_buttons = []
-        for c in range(game.board_size):
-            text_btn = game.board[r][c]
-            cb_data = f"move_{mode}_{game_id}_{r}_{c}"
-            if text_btn == game.empty_square and (r, c) in valid_moves:
-                text_btn = '🔷'
-            row_buttons.append(types.InlineKeyboardButton(text_btn, callback_data=cb_data))
-        buttons.append(row_buttons)
-
-    markup.keyboard = buttons
-    markup.add(
-        types.InlineKeyboardButton(
-            "❌ Surrender",
-            callback_data=f"forfeit_{mode}_{game_id}"
-        )
+def run_webhook():
+    secret = WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    webhook = WebhookServer(
+        bot, secret, urlsplit(WEBHOOK_URL).path or '/', workers=BOT_THREADS, queue_size=WEBHOOK_QUEUE,
+        overloaded=lambda: game_workers.pending() > MAX_GAME_BACKLOG, record=WEBHOOK_RECORD,
+        on_error=lambda e: log_error('webhook', e)
     )
-    return markup
+    metrics.gauge('webhook_queue', webhook.pending)
+    metrics.counter('webhook_accepted_total', lambda: webhook.accepted)
+    metrics.counter('webhook_rejected_total', lambda: webhook.rejected)
+    metrics.counter('webhook_forbidden_total', lambda: webhook.forbidden)
+    webhook.serve(WEBHOOK_PORT, WEBHOOK_HOST)
+    try:
+        bot.set_webhook(WEBHOOK_URL, secret_token=secret, max_connections=BOT_THREADS)
+    except Exception as e:
+        # Keep serving: updates replayed locally do not need Telegram.
+        log_error('set_webhook', e)
+    print(f"Bot is running, webhook on {WEBHOOK_HOST}:{WEBHOOK_PORT}...")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        webhook.shutdown()
 
 
-if __name__ == '__main__':
-    load_stats()
+def run_polling():
+    # A webhook left by an earlier run in webhook mode makes getUpdates fail
+    # with 409 Conflict.
+    try:
+        bot.remove_webhook()
+    except Exception as e:
+        log_error('remove_webhook', e)
     print("Bot is running...")
     while True:
         try:
             bot.polling(none_stop=True, interval=0, timeout=20)
+            break
         except Exception as e:
-            print(f"Bot polling error: {e}")
+            log_error('polling', e)
             time.sleep(5)
+
+
+if __name__ == '__main__':
+    game_workers.start()
+    dispatcher.start()
+    atexit.register(dispatcher.close)
+    load_stats()
+    load_games()
+    if metrics.enabled:
+        start_metrics()
+    scheduler.call_later(SWEEP_INTERVAL, sweep_sessions)
+    scheduler.call_later(MATCHMAKING_INTERVAL, sweep_matchmaking)
+    # Treat SIGTERM like Ctrl+C so the bot stops and pending stats are flushed.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    if WEBHOOK_URL:
+        run_webhook()
+    else:
+        run_polling()
@@ -0,0 +1,54 @@
+import base64
+import binascii
+import hashlib
+import struct
+from collections import namedtuple
+
+# callback_data layout, version 1 (8 bytes, 11 base64 characters):
+#   version:u8  action:u8  mode:u8  game_id:u32  square:u8
+VERSION = 1
+_LAYOUT = struct.Struct('>BBBIB')
+ENCODED_LENGTH = 11
+
+VS_AI = 1
+RANDOM_QUEUE = 2
+ACCEPT = 3
+MOVE = 4
+FORFEIT = 5
+RANDOM_CANCEL = 6
+
+MODES = ('', 'ai', '2p', 'rnd')
+_MODE_CODES = {mode: code for code, mode in enumerate(MODES)}
+
+CallbackData = namedtuple('CallbackData', 'action mode game_id row col')
+
+# Buttons sent before the compact format existed.
+LEGACY_CALLBACKS = {
+    'vs_ai': CallbackData(VS_AI, '', 0, 0, 0),
+    'random_queue': CallbackData(RANDOM_QUEUE, '', 0, 0, 0),
+}
+
+
+def encode(action, mode='', game_id=0, row=0, col=0):
+    packed = _LAYOUT.pack(VERSION, action, _MODE_CODES[mode], game_id, row * 8 + col)
+    return base64.urlsafe_b64encode(packed).rstrip(b'=').decode('ascii')
+
+
+def seeded_handle(seed, chat_id, message_id):
+    # A game handle that only depends on the seed and the message showing the
+    # board, so recorded button presses address the same game after a restart.
+    key = f'{seed}:{chat_id}:{message_id}'.encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(key, digest_size=4).digest(), 'big')
+
+
+def decode(data):
+    if len(data) != ENCODED_LENGTH:
+        return LEGACY_CALLBACKS.get(data)
+    try:
+        version, action, mode, game_id, square = _LAYOUT.unpack(base64.urlsafe_b64decode(data + '='))
+    except (binascii.Error, struct.error, ValueError):
+        return None
+    if version != VERSION or mode >= len(MODES):
+        return None
+    row, col = divmod(square, 8)
+    return CallbackData(action, MODES[mode], game_id, row, col)
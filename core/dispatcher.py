@@ -0,0 +1,211 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from telebot.apihelper import ApiTelegramException
+
+SEND_WORKERS = 4
+# Telegram asks bots to stay under about one message per second in a chat
+# and 30 per second overall.
+CHAT_INTERVAL = 1.0
+GLOBAL_RATE = 30.0
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5
+PRUNE_EVERY = 1024
+
+
+def pooled_session(size):
+    # One keep-alive connection pool shared by every sender thread; assign it
+    # to apihelper.session so telebot stops opening a session per thread.
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def retry_after(error):
+    # Seconds Telegram asked us to wait (429 Too Many Requests), else None.
+    if isinstance(error, ApiTelegramException) and error.error_code == 429:
+        parameters = error.result_json.get('parameters') or {}
+        return float(parameters.get('retry_after', 1))
+    return None
+
+
+def is_transient(error):
+    if isinstance(error, ApiTelegramException):
+        return error.error_code >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+class Dispatcher:
+    # Queues outgoing messages and edits and sends them from a few threads.
+    # Each chat (or inline message) gets its own FIFO that is sent by one
+    # thread at a time, at most once per chat_interval, under a global rate
+    # limit. An edit replaces any edit still queued for the same message, so
+    # a burst of board updates costs one request. 429 answers hold the chat
+    # back for retry_after and are retried unless a newer edit replaced them.
+    def __init__(
+        self, bot, workers=SEND_WORKERS, chat_interval=CHAT_INTERVAL, global_rate=GLOBAL_RATE,
+        max_retries=MAX_RETRIES, on_error=None
+    ):
+        # on_error(method, kwargs, exception) is called for requests that are
+        # given up on.
+        self.bot = bot
+        self.workers = workers
+        self.chat_interval = chat_interval
+        self.global_interval = 1.0 / global_rate if global_rate else 0.0
+        self.max_retries = max_retries
+        self.on_error = on_error
+        self.queues = {}
+        self.pending_requests = {}
+        self.ready = []
+        self.busy = set()
+        self.next_allowed = {}
+        self.next_global = 0.0
+        self.condition = threading.Condition()
+        self.counter = itertools.count()
+        self.stopped = False
+        self.sent = 0
+        self.coalesced = 0
+        self.retried = 0
+        self.failed = 0
+        self.threads = []
+
+    def start(self):
+        # Requests queued before start() are sent once the threads run.
+        if not self.threads:
+            self.threads = [
+                threading.Thread(target=self._run, name=f'sender-{i}', daemon=True) for i in range(self.workers)
+            ]
+            for thread in self.threads:
+                thread.start()
+
+    def edit_message_text(self, text, chat_id=None, message_id=None, inline_message_id=None, reply_markup=None):
+        # Same arguments as TeleBot.edit_message_text, so BoardRenderer can
+        # send through the dispatcher.
+        if inline_message_id:
+            chat, key = inline_message_id, ('edit', inline_message_id)
+        else:
+            chat, key = chat_id, ('edit', chat_id, message_id)
+        kwargs = {
+            'text': text, 'chat_id': chat_id, 'message_id': message_id,
+            'inline_message_id': inline_message_id, 'reply_markup': reply_markup,
+        }
+        self._submit(chat, key, 'edit_message_text', kwargs)
+
+    def send_message(self, chat_id, text, reply_markup=None):
+        kwargs = {'chat_id': chat_id, 'text': text, 'reply_markup': reply_markup}
+        self._submit(chat_id, ('send', next(self.counter)), 'send_message', kwargs)
+
+    def pending(self):
+        with self.condition:
+            return len(self.pending_requests) + len(self.busy)
+
+    def flush(self, timeout=None):
+        # Waits until everything queued so far has been sent or given up on.
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while self.pending_requests or self.busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    def close(self, timeout=5.0):
+        self.flush(timeout)
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+    def _submit(self, chat, key, method, kwargs):
+        with self.condition:
+            if key in self.pending_requests:
+                # Still queued: keep its place in line but send the new state.
+                self.pending_requests[key] = (method, kwargs, 0)
+                self.coalesced += 1
+                return
+            self.pending_requests[key] = (method, kwargs, 0)
+            queue = self.queues.get(chat)
+            if queue is None:
+                queue = self.queues[chat] = deque()
+            queue.append(key)
+            if len(queue) == 1 and chat not in self.busy:
+                self._schedule(chat, time.monotonic())
+            self.condition.notify()
+
+    def _schedule(self, chat, now):
+        heapq.heappush(self.ready, (max(now, self.next_allowed.get(chat, 0.0)), next(self.counter), chat))
+
+    def _next(self):
+        with self.condition:
+            while True:
+                if self.stopped:
+                    return None
+                now = time.monotonic()
+                if self.ready:
+                    due = max(self.ready[0][0], self.next_global)
+                    if due <= now:
+                        break
+                    self.condition.wait(due - now)
+                else:
+                    self.condition.wait()
+            _, _, chat = heapq.heappop(self.ready)
+            key = self.queues[chat].popleft()
+            method, kwargs, attempts = self.pending_requests.pop(key)
+            self.busy.add(chat)
+            self.next_global = max(now, self.next_global) + self.global_interval
+            return chat, key, method, kwargs, attempts
+
+    def _run(self):
+        while True:
+            task = self._next()
+            if task is None:
+                return
+            chat, key, method, kwargs, attempts = task
+            delay = self.chat_interval
+            try:
+                getattr(self.bot, method)(**kwargs)
+                error = None
+            except Exception as e:
+                error = e
+            with self.condition:
+                if error is None:
+                    self.sent += 1
+                elif 'message is not modified' in str(error):
+                    error = None
+                elif retry_after(error) is not None or (is_transient(error) and attempts < self.max_retries):
+                    wait = retry_after(error)
+                    delay = max(delay, wait if wait is not None else RETRY_BACKOFF * 2 ** attempts)
+                    if key not in self.pending_requests:
+                        # Retry first unless a newer edit already replaced it.
+                        self.pending_requests[key] = (method, kwargs, attempts + 1)
+                        self.queues[chat].appendleft(key)
+                    self.retried += 1
+                    error = None
+                else:
+                    self.failed += 1
+                self._finish(chat, delay)
+            if error is not None:
+                if self.on_error is not None:
+                    self.on_error(method, kwargs, error)
+                else:
+                    print(f"Error in {method}: {error}")
+
+    def _finish(self, chat, delay):
+        # Called with the lock held once a request for chat is done.
+        now = time.monotonic()
+        self.busy.discard(chat)
+        self.next_allowed[chat] = now + delay
+        if self.queues[chat]:
+            self._schedule(chat, now)
+        else:
+            del self.queues[chat]
+        if (self.sent + self.retried + self.failed) % PRUNE_EVERY == 0:
+            self.next_allowed = {c: t for c, t in self.next_allowed.items() if t > now or c in self.queues}
+        self.condition.notify_all()
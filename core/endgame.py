@@ -0,0 +1,93 @@
+import time
+
+from bitboard import FULL, apply_move, get_flips, get_moves, iter_squares, popcount
+
+ENDGAME_EMPTIES = 10
+# Share of a move's time limit the solver may use before the search takes
+# over with what is left.
+ENDGAME_SHARE = 0.75
+
+# Below this many empties, sorting children by mobility costs more than it saves.
+MOBILITY_ORDER_EMPTIES = 6
+
+QUADRANTS = (
+    0x000000000F0F0F0F,
+    0x00000000F0F0F0F0,
+    0x0F0F0F0F00000000,
+    0xF0F0F0F000000000,
+)
+INFINITY = float('inf')
+
+
+class EndgameTimeout(Exception):
+    pass
+
+
+def odd_regions(empty):
+    # Playing into a quadrant with an odd number of empties tends to leave the
+    # last move in that region to us, so those squares are tried first.
+    odd = 0
+    for quadrant in QUADRANTS:
+        if popcount(empty & quadrant) & 1:
+            odd |= quadrant
+    return odd
+
+
+class EndgameSolver:
+    def __init__(self, time_limit=0):
+        # time_limit 0 solves without a deadline.
+        self.time_limit = time_limit
+        self.nodes = 0
+        self.deadline = INFINITY
+
+    def solve(self, own, opp):
+        moves = get_moves(own, opp)
+        if not moves:
+            return None, None
+
+        self.nodes = 0
+        self.deadline = time.perf_counter() + self.time_limit if self.time_limit else INFINITY
+
+        alpha = -INFINITY
+        best_move = None
+        for sq, new_own, new_opp in self._children(own, opp, moves):
+            score = -self._negamax(new_opp, new_own, -INFINITY, -alpha, False)
+            if score > alpha:
+                alpha = score
+                best_move = sq
+        return alpha, best_move
+
+    def _children(self, own, opp, moves):
+        empty = ~(own | opp) & FULL
+        odd = odd_regions(empty)
+        children = []
+        for sq in iter_squares(moves):
+            new_own, new_opp = apply_move(own, opp, sq, get_flips(own, opp, sq))
+            key = 0 if odd >> sq & 1 else 1
+            if popcount(empty) > MOBILITY_ORDER_EMPTIES:
+                key += 2 * popcount(get_moves(new_opp, new_own))
+            children.append((key, sq, new_own, new_opp))
+        children.sort(key=lambda child: child[0])
+        return [child[1:] for child in children]
+
+    def _negamax(self, own, opp, alpha, beta, passed):
+        self.nodes += 1
+        if not self.nodes & 1023 and time.perf_counter() > self.deadline:
+            raise EndgameTimeout()
+
+        moves = get_moves(own, opp)
+        if not moves:
+            if passed:
+                return popcount(own) - popcount(opp)
+            return -self._negamax(opp, own, -beta, -alpha, True)
+
+        best = -INFINITY
+        for _, new_own, new_opp in self._children(own, opp, moves):
+            score = -self._negamax(new_opp, new_own, -beta, -alpha, False)
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best
@@ -0,0 +1,227 @@
+import argparse
+import itertools
+import json
+import queue
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+# A minimal stand-in for the Telegram Bot API, for load testing bot.py locally.
+# Start it, then run the bot against it:
+#   python core/fake_telegram.py --games 200
+#   TELEGRAM_TOKEN=1:fake TELEGRAM_API_URL=http://127.0.0.1:8081/bot{0}/{1} python core/bot.py
+# Every simulated player starts a game vs the AI and clicks a random legal
+# move (a 🔷 button) whenever its board offers one. --flood answers that share
+# of sends and edits with 429 Too Many Requests, to exercise the retries.
+
+PATH_PATTERN = re.compile(r'^/bot[^/]+/(\w+)$')
+MOVE_BUTTON = '🔷'
+FLOOD_METHODS = ('sendMessage', 'editMessageText')
+FLOOD_RETRY_AFTER = 1
+FIRST_USER_ID = 100000
+
+
+class FakeTelegram:
+    def __init__(self, games=0, think_time=0.2, seed=None, flood=0.0):
+        self.updates = []
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1000)
+        self.messages = {}
+        self.condition = threading.Condition()
+        self.rng = random.Random(seed)
+        self.think_time = think_time
+        self.reactions = queue.Queue()
+        self.started = {}
+        self.finished = {}
+        self.api_calls = 0
+        self.games = games
+        self.flood = flood
+        self.flooded = 0
+
+    def push_update(self, update):
+        with self.condition:
+            update['update_id'] = next(self.update_ids)
+            self.updates.append(update)
+            self.condition.notify_all()
+
+    def call(self, method, params):
+        with self.condition:
+            self.api_calls += 1
+            if method in FLOOD_METHODS and self.rng.random() < self.flood:
+                self.flooded += 1
+                # None tells the HTTP handler to answer 429.
+                return None
+        handler = getattr(self, 'api_' + method, None)
+        if handler is None:
+            return True
+        return handler(params)
+
+    def api_getMe(self, params):
+        return {'id': 1, 'is_bot': True, 'first_name': 'Fake Othello', 'username': 'fake_othello_bot'}
+
+    def api_getUpdates(self, params):
+        offset = int(params.get('offset') or 0)
+        timeout = float(params.get('timeout') or 0)
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            self.updates = [u for u in self.updates if u['update_id'] >= offset]
+            while not self.updates and time.monotonic() < deadline:
+                self.condition.wait(deadline - time.monotonic())
+            return list(self.updates)
+
+    def api_sendMessage(self, params):
+        chat_id = int(params['chat_id'])
+        message_id = next(self.message_ids)
+        return self._store(chat_id, message_id, params)
+
+    def api_editMessageText(self, params):
+        if params.get('inline_message_id'):
+            return True
+        return self._store(int(params['chat_id']), int(params['message_id']), params)
+
+    def _store(self, chat_id, message_id, params):
+        markup = params.get('reply_markup')
+        if isinstance(markup, str):
+            markup = json.loads(markup)
+        message = {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'text': params.get('text', ''),
+        }
+        if markup and 'inline_keyboard' in markup:
+            # Like Telegram, only inline keyboards are echoed back.
+            message['reply_markup'] = markup
+        with self.condition:
+            self.messages[(chat_id, message_id)] = message
+        self.reactions.put((chat_id, message))
+        return message
+
+    def start_games(self):
+        for i in range(self.games):
+            user_id = FIRST_USER_ID + i
+            message = {
+                'message_id': next(self.message_ids),
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'text': 'Choose your opponent:',
+            }
+            self.started[user_id] = time.monotonic()
+            self.click(user_id, message, 'vs_ai')
+
+    def click(self, user_id, message, data):
+        self.push_update({
+            'callback_query': {
+                'id': str(next(self.update_ids)),
+                'from': {'id': user_id, 'is_bot': False, 'first_name': f'Player{user_id}'},
+                'message': message,
+                'chat_instance': str(user_id),
+                'data': data,
+            }
+        })
+
+    def run_players(self):
+        while True:
+            chat_id, message = self.reactions.get()
+            if chat_id not in self.started or chat_id in self.finished:
+                continue
+            if 'Game Over' in message['text']:
+                self.finished[chat_id] = time.monotonic()
+                continue
+            buttons = [
+                button
+                for row in message.get('reply_markup', {}).get('inline_keyboard', [])
+                for button in row
+                if button.get('text') == MOVE_BUTTON
+            ]
+            if buttons:
+                choice = self.rng.choice(buttons)
+                delay = self.rng.uniform(0, self.think_time)
+                threading.Timer(delay, self.click, (chat_id, message, choice['callback_data'])).start()
+
+    def report(self):
+        durations = [self.finished[u] - self.started[u] for u in self.finished]
+        average = sum(durations) / len(durations) if durations else 0.0
+        return (
+            f"games finished: {len(self.finished)}/{len(self.started)}, "
+            f"avg game time: {average:.1f}s, api calls: {self.api_calls}, flooded: {self.flooded}"
+        )
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self._handle()
+
+        def do_POST(self):
+            self._handle()
+
+        def _handle(self):
+            url = urlsplit(self.path)
+            match = PATH_PATTERN.match(url.path)
+            if not match:
+                self.send_error(404)
+                return
+            params = dict(parse_qsl(url.query))
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                body = self.rfile.read(length).decode()
+                if self.headers.get('Content-Type', '').startswith('application/json'):
+                    params.update(json.loads(body))
+                else:
+                    params.update(parse_qsl(body))
+            result = fake.call(match.group(1), params)
+            if result is None:
+                status, reply = 429, {
+                    'ok': False, 'error_code': 429,
+                    'description': f'Too Many Requests: retry after {FLOOD_RETRY_AFTER}',
+                    'parameters': {'retry_after': FLOOD_RETRY_AFTER},
+                }
+            else:
+                status, reply = 200, {'ok': True, 'result': result}
+            payload = json.dumps(reply).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API server with simulated AI-game players.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--games', type=int, default=50)
+    parser.add_argument('--think-time', type=float, default=0.2)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--report-every', type=float, default=5.0)
+    parser.add_argument('--flood', type=float, default=0.0, help="share of sends and edits answered with 429")
+    args = parser.parse_args()
+
+    fake = FakeTelegram(games=args.games, think_time=args.think_time, seed=args.seed, flood=args.flood)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(fake))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    threading.Thread(target=fake.run_players, daemon=True).start()
+    print(f"Fake Telegram API listening on http://{args.host}:{args.port}")
+    fake.start_games()
+    try:
+        # With --games 0 it only serves the API (e.g. for replay_updates.py) until Ctrl+C.
+        while not fake.games or len(fake.finished) < len(fake.started):
+            time.sleep(args.report_every)
+            print(fake.report())
+    except KeyboardInterrupt:
+        pass
+    print(fake.report())
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,15 @@
+from bitboard import (
+    START_BLACK, START_WHITE, apply_move, get_flips, get_moves, iter_squares, popcount, square
+)
+from book import shared_book
+from endgame import ENDGAME_EMPTIES
+from evaluation import WEIGHT_ROWS
+from search import DEFAULT_TIME_LIMIT, MAX_DEPTH, Searcher
+from transposition import GAME_TABLE_SIZE, TranspositionTable
+
+AI_TT_SIZE = GAME_TABLE_SIZE
+
+
 class Othello:
     def __init__(self, player1_id=None, player1_name=None, player2_id=None, player2_name=None):
         self.board_size = 8
@@ -8,19 +20,67 @@ class Othello:
         self.player2_name = player2_name
         self.player1_id = player1_id
         self.player2_id = player2_id
+        self.tt = None
         self.reset_board()
 
-    def new_board(self):
-        board = [[self.empty_square for _ in range(self.board_size)] for _ in range(self.board_size)]
-        board[3][3] = self.player_white
-        board[3][4] = self.player_black
-        board[4][3] = self.player_black
-        board[4][4] = self.player_white
-        return board
+    @property
+    def board(self):
+        # The emoji grid is only a view over the bitboards; it is rebuilt lazily
+        # after a move, so writes to the returned lists are not kept.
+        if self._board_view is None:
+            self._board_view = [
+                [self._square_symbol(square(r, c)) for c in range(self.board_size)]
+                for r in range(self.board_size)
+            ]
+        return self._board_view
+
+    @board.setter
+    def board(self, board):
+        black = 0
+        white = 0
+        for r in range(self.board_size):
+            for c in range(self.board_size):
+                if board[r][c] == self.player_black:
+                    black |= 1 << square(r, c)
+                elif board[r][c] == self.player_white:
+                    white |= 1 << square(r, c)
+        self._load_bitboards(black, white)
+
+    def _square_symbol(self, sq):
+        bit = 1 << sq
+        if self.black & bit:
+            return self.player_black
+        if self.white & bit:
+            return self.player_white
+        return self.empty_square
+
+    def _bitboards(self, player):
+        if player == self.player_black:
+            return self.black, self.white
+        return self.white, self.black
+
+    def _set_bitboards(self, player, own, opp):
+        if player == self.player_black:
+            self.black, self.white = own, opp
+        else:
+            self.white, self.black = own, opp
+        self._board_view = None
+        self._valid_moves = {}
+
+    def _load_bitboards(self, black, white):
+        self.black = black
+        self.white = white
+        self._counts = {self.player_black: popcount(black), self.player_white: popcount(white)}
+        self._board_view = None
+        self._valid_moves = {}
+        self.history = []
+
+    def set_position(self, black, white, black_to_move=True):
+        self._load_bitboards(black, white)
+        self.current_player = self.player_black if black_to_move else self.player_white
 
     def reset_board(self):
-        self.board = self.new_board()
-        self.current_player = self.player_black
+        self.set_position(START_BLACK, START_WHITE)
 
     def get_opponent(self, player):
         return self.player_white if player == self.player_black else self.player_black
@@ -38,156 +98,82 @@ class Othello:
             return self.player2_name
 
     def is_valid_move(self, row, col, player):
-        if not (
-            0 <= row < self.board_size and
-            0 <= col < self.board_size and
-            self.board[row][col] == self.empty_square
-        ):
+        if not (0 <= row < self.board_size and 0 <= col < self.board_size):
             return False
-
-        opponent = self.get_opponent(player)
-        for dr, dc in [(0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (-1, -1), (1, -1), (-1, 1)]:
-            r, c = row + dr, col + dc
-            if 0 <= r < self.board_size and 0 <= c < self.board_size and self.board[r][c] == opponent:
-                r, c = r + dr, c + dc
-                while 0 <= r < self.board_size and 0 <= c < self.board_size:
-                    if self.board[r][c] == player:
-                        return True
-                    if self.board[r][c] == self.empty_square:
-                        break
-                    r, c = r + dr, c + dc
-        return False
+        own, opp = self._bitboards(player)
+        return get_flips(own, opp, square(row, col)) != 0
 
     def get_valid_moves(self, player):
-        return [
-            (r, c)
-            for r in range(self.board_size)
-            for c in range(self.board_size)
-            if self.is_valid_move(r, c, player)
-        ]
+        # Cached per side until the position changes; callers must not mutate the list.
+        moves = self._valid_moves.get(player)
+        if moves is None:
+            own, opp = self._bitboards(player)
+            moves = [divmod(sq, self.board_size) for sq in iter_squares(get_moves(own, opp))]
+            self._valid_moves[player] = moves
+        return moves
 
     def make_move(self, row, col, player):
-        if not self.is_valid_move(row, col, player):
+        if not (0 <= row < self.board_size and 0 <= col < self.board_size):
             return False
 
-        opponent = self.get_opponent(player)
-        self.board[row][col] = player
-
-        for dr, dc in [(0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (-1, -1), (1, -1), (-1, 1)]:
-            r, c = row + dr, col + dc
-            tiles_to_flip = []
-            while 0 <= r < self.board_size and 0 <= c < self.board_size:
-                if self.board[r][c] == self.empty_square:
-                    break
-                if self.board[r][c] == opponent:
-                    tiles_to_flip.append((r, c))
-                if self.board[r][c] == player:
-                    for flip_r, flip_c in tiles_to_flip:
-                        self.board[flip_r][flip_c] = player
-                    break
-                r, c = r + dr, c + dc
+        sq = square(row, col)
+        own, opp = self._bitboards(player)
+        flips = get_flips(own, opp, sq)
+        if not flips:
+            return False
+
+        own, opp = apply_move(own, opp, sq, flips)
+        self._set_bitboards(player, own, opp)
+        self.history.append((sq, flips, player))
+        flipped = popcount(flips)
+        self._counts[player] += flipped + 1
+        self._counts[self.get_opponent(player)] -= flipped
 
         self.current_player = self.get_opponent(player)
         return True
 
+    def undo_move(self):
+        if not self.history:
+            return False
+
+        sq, flips, player = self.history.pop()
+        own, opp = self._bitboards(player)
+        self._set_bitboards(player, own & ~(flips | 1 << sq), opp | flips)
+        flipped = popcount(flips)
+        self._counts[player] -= flipped + 1
+        self._counts[self.get_opponent(player)] += flipped
+        self.current_player = player
+        return True
+
+    def to_compact(self):
+        return self.black, self.white, self.current_player == self.player_black
+
     def get_score(self):
-        score = {self.player_black: 0, self.player_white: 0}
-        for r in range(self.board_size):
-            for c in range(self.board_size):
-                if self.board[r][c] in score:
-                    score[self.board[r][c]] += 1
-        return score
+        return dict(self._counts)
 
     def evaluate_board(self, board, player):
         opponent = self.player_white if player == self.player_black else self.player_black
-
-        weights = [
-            [100, -20, 10, 5, 5, 10, -20, 100],
-            [-20, -50, -2, -2, -2, -2, -50, -20],
-            [10, -2, -1, -1, -1, -1, -2, 10],
-            [5, -2, -1, -1, -1, -1, -2, 5],
-            [5, -2, -1, -1, -1, -1, -2, 5],
-            [10, -2, -1, -1, -1, -1, -2, 10],
-            [-20, -50, -2, -2, -2, -2, -50, -20],
-            [100, -20, 10, 5, 5, 10, -20, 100]
-        ]
-
         score = 0
-        for r in range(8):
-            for c in range(8):
-                if board[r][c] == player:
-                    score += weights[r][c]
-                elif board[r][c] == opponent:
-                    score -= weights[r][c]
+        for row, weights in zip(board, WEIGHT_ROWS):
+            for cell, weight in zip(row, weights):
+                if cell == player:
+                    score += weight
+                elif cell == opponent:
+                    score -= weight
         return score
 
-    def get_ai_move(self):
-        import copy
-
-        def get_valid_moves_sim(board, player):
-            moves = []
-            opponent = self.player_white if player == self.player_black else self.player_black
-            for r in range(8):
-                for c in range(8):
-                    if board[r][c] != self.empty_square: continue
-                    for dr, dc in [(0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (-1, -1), (1, -1), (-1, 1)]:
-                        rr, cc = r + dr, c + dc
-                        if 0 <= rr < 8 and 0 <= cc < 8 and board[rr][cc] == opponent:
-                            while 0 <= rr < 8 and 0 <= cc < 8:
-                                rr += dr
-                                cc += dc
-                                if not (0 <= rr < 8 and 0 <= cc < 8): break
-                                if board[rr][cc] == player:
-                                    moves.append((r, c))
-                                    break
-                                if board[rr][cc] == self.empty_square: break
-                    if (r, c) in moves: continue
-            return list(set(moves))
-
-        def simulate_move(board, move, player):
-            new_board = copy.deepcopy(board)
-            r, c = move
-            new_board[r][c] = player
-            opponent = self.player_white if player == self.player_black else self.player_black
-
-            for dr, dc in [(0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (-1, -1), (1, -1), (-1, 1)]:
-                rr, cc = r + dr, c + dc
-                tiles = []
-                while 0 <= rr < 8 and 0 <= cc < 8 and new_board[rr][cc] == opponent:
-                    tiles.append((rr, cc))
-                    rr += dr
-                    cc += dc
-                if 0 <= rr < 8 and 0 <= cc < 8 and new_board[rr][cc] == player:
-                    for tr, tc in tiles:
-                        new_board[tr][tc] = player
-            return new_board
-
-        def minimax(board, depth, maximizing_player, current_turn_player):
-            valid_moves = get_valid_moves_sim(board, current_turn_player)
-
-            if depth == 0 or not valid_moves:
-                return self.evaluate_board(board, self.player_white), None
-
-            best_move = valid_moves[0]
-
-            if maximizing_player:
-                max_eval = -float('inf')
-                for move in valid_moves:
-                    new_board = simulate_move(board, move, current_turn_player)
-                    eval_score, _ = minimax(new_board, depth - 1, False, self.player_black)
-                    if eval_score > max_eval:
-                        max_eval = eval_score
-                        best_move = move
-                return max_eval, best_move
-            else:
-                min_eval = float('inf')
-                for move in valid_moves:
-                    new_board = simulate_move(board, move, current_turn_player)
-                    eval_score, _ = minimax(new_board, depth - 1, True, self.player_white)
-                    if eval_score < min_eval:
-                        min_eval = eval_score
-                        best_move = move
-                return min_eval, best_move
-
-        _, best_move = minimax(self.board, 3, True, self.player_white)
-        return best_move
+    def get_ai_move(
+        self, time_limit=DEFAULT_TIME_LIMIT, max_depth=MAX_DEPTH, endgame_empties=ENDGAME_EMPTIES, book_path=None
+    ):
+        own, opp = self._bitboards(self.current_player)
+        if book_path:
+            book_move = shared_book(book_path).lookup(own, opp)
+            if book_move is not None:
+                return divmod(book_move, self.board_size)
+        if self.tt is None:
+            self.tt = TranspositionTable(AI_TT_SIZE)
+        searcher = Searcher(time_limit, max_depth, self.tt, endgame_empties=endgame_empties)
+        best_move = searcher.search(own, opp)
+        if best_move is None:
+            return None
+        return divmod(best_move, self.board_size)
@@ -0,0 +1,149 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+QUEUE_TIMEOUT = 5 * 60
+DEFAULT_RATING = 1000
+BUCKET_SIZE = 50
+# Allowed rating gap: starts at BASE_BAND, widens by WIDEN_PER_SECOND while a
+# player waits, and never exceeds MAX_BAND.
+BASE_BAND = 100
+WIDEN_PER_SECOND = 5
+MAX_BAND = 600
+
+
+class Ticket:
+    def __init__(self, user_id, name, chat_id, message_id, rating=None):
+        self.user_id = user_id
+        self.name = name
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.rating = DEFAULT_RATING if rating is None else rating
+        self.enqueued_at = None
+        self.seq = None
+
+
+class Matchmaker:
+    # Waiting players are kept in rating buckets of BUCKET_SIZE points, each an
+    # insertion-ordered dict, so enqueue and cancel are O(1) and a match only
+    # looks at the buckets inside the allowed band. Timeouts sit in a heap.
+    def __init__(
+        self, timeout=QUEUE_TIMEOUT, use_ratings=True, base_band=BASE_BAND,
+        widen_per_second=WIDEN_PER_SECOND, max_band=MAX_BAND
+    ):
+        self.timeout = timeout
+        self.use_ratings = use_ratings
+        self.base_band = base_band
+        self.widen_per_second = widen_per_second
+        self.max_band = max_band
+        self.tickets = {}
+        self.buckets = {}
+        self.deadlines = []
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.tickets)
+
+    def is_queued(self, user_id):
+        with self.lock:
+            return user_id in self.tickets
+
+    def enqueue(self, ticket, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if ticket.user_id in self.tickets:
+                return None
+            ticket.enqueued_at = now
+            ticket.seq = next(self.counter)
+            opponent = self._find_opponent(ticket, now)
+            if opponent is not None:
+                self._remove(opponent)
+                return opponent
+            self.tickets[ticket.user_id] = ticket
+            self.buckets.setdefault(self._bucket(ticket.rating), OrderedDict())[ticket.user_id] = ticket
+            heapq.heappush(self.deadlines, (now + self.timeout, ticket.seq, ticket))
+            return None
+
+    def cancel(self, user_id):
+        with self.lock:
+            ticket = self.tickets.get(user_id)
+            if ticket is not None:
+                self._remove(ticket)
+            return ticket
+
+    def sweep(self, now=None):
+        # Returns (matches, timed_out): pairs that became compatible as their
+        # bands widened, oldest ticket first, and tickets that waited too long.
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            timed_out = []
+            while self.deadlines and self.deadlines[0][0] <= now:
+                _, _, ticket = heapq.heappop(self.deadlines)
+                if self.tickets.get(ticket.user_id) is ticket:
+                    self._remove(ticket)
+                    timed_out.append(ticket)
+
+            matches = []
+            for bucket in sorted(self.buckets):
+                queue = self.buckets.get(bucket)
+                while queue:
+                    oldest = next(iter(queue.values()))
+                    self._remove(oldest)
+                    opponent = self._find_opponent(oldest, now)
+                    if opponent is None:
+                        self._restore(oldest)
+                        break
+                    self._remove(opponent)
+                    matches.append((oldest, opponent) if oldest.seq < opponent.seq else (opponent, oldest))
+                    queue = self.buckets.get(bucket)
+            return matches, timed_out
+
+    def _band(self, ticket, now):
+        if not self.use_ratings:
+            return float('inf')
+        return min(self.max_band, self.base_band + self.widen_per_second * (now - ticket.enqueued_at))
+
+    def _bucket(self, rating):
+        return rating // BUCKET_SIZE if self.use_ratings else 0
+
+    def _find_opponent(self, ticket, now):
+        band = self._band(ticket, now)
+        if not self.use_ratings:
+            queue = self.buckets.get(0)
+            return next(iter(queue.values())) if queue else None
+
+        best = None
+        low = self._bucket(ticket.rating - self.max_band)
+        high = self._bucket(ticket.rating + self.max_band)
+        for bucket in range(low, high + 1):
+            queue = self.buckets.get(bucket)
+            if not queue:
+                continue
+            # Ratings within a bucket are close and its tickets are ordered by
+            # age, so only the oldest (widest band) one is considered.
+            candidate = next(iter(queue.values()))
+            gap = abs(candidate.rating - ticket.rating)
+            if gap > max(band, self._band(candidate, now)):
+                continue
+            if best is None or (gap, candidate.seq) < (abs(best.rating - ticket.rating), best.seq):
+                best = candidate
+        return best
+
+    def _remove(self, ticket):
+        self.tickets.pop(ticket.user_id, None)
+        bucket = self._bucket(ticket.rating)
+        queue = self.buckets.get(bucket)
+        if queue is not None:
+            queue.pop(ticket.user_id, None)
+            if not queue:
+                del self.buckets[bucket]
+
+    def _restore(self, ticket):
+        self.tickets[ticket.user_id] = ticket
+        queue = self.buckets.setdefault(self._bucket(ticket.rating), OrderedDict())
+        queue[ticket.user_id] = ticket
+        queue.move_to_end(ticket.user_id, last=False)
@@ -0,0 +1,125 @@
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import START_BLACK, START_WHITE, apply_move, get_flips, get_moves, iter_squares, popcount
+
+# Leaf counts from the start position. No game can end or pass within these
+# depths, so they hold under any pass convention.
+KNOWN_COUNTS = {1: 4, 2: 12, 3: 56, 4: 244, 5: 1396, 6: 8200, 7: 55092, 8: 390216}
+
+
+def perft(own, opp, depth):
+    # Leaves of the game tree depth plies below (own, opp), own to move. A
+    # pass counts as a ply and a finished game is a leaf at any depth.
+    if depth == 0:
+        return 1
+    moves = get_moves(own, opp)
+    if not moves:
+        if not get_moves(opp, own):
+            return 1
+        return perft(opp, own, depth - 1)
+    if depth == 1:
+        return popcount(moves)
+    count = 0
+    for sq in iter_squares(moves):
+        new_own, new_opp = apply_move(own, opp, sq, get_flips(own, opp, sq))
+        count += perft(new_opp, new_own, depth - 1)
+    return count
+
+
+def perft_game(game, depth):
+    # The same count through the public Othello API (get_valid_moves,
+    # make_move, undo_move), to check it against the bitboard version.
+    if depth == 0:
+        return 1
+    player = game.current_player
+    moves = game.get_valid_moves(player)
+    if not moves:
+        opponent = game.get_opponent(player)
+        if not game.get_valid_moves(opponent):
+            return 1
+        game.current_player = opponent
+        count = perft_game(game, depth - 1)
+        game.current_player = player
+        return count
+    count = 0
+    for r, c in list(moves):
+        game.make_move(r, c, player)
+        count += perft_game(game, depth - 1)
+        game.undo_move()
+    return count
+
+
+def divide(own, opp, depth, workers=1):
+    # {root move: leaf count}, summing to perft(own, opp, depth). A forced
+    # pass at the root is reported as None, and so is a root that is itself
+    # a leaf (depth 0 or a finished game). With workers > 1 the root moves
+    # are counted in separate processes.
+    if depth == 0:
+        return {None: 1}
+    moves = get_moves(own, opp)
+    if not moves:
+        if not get_moves(opp, own):
+            return {None: 1}
+        return {None: perft(opp, own, depth - 1)}
+    children = []
+    for sq in iter_squares(moves):
+        new_own, new_opp = apply_move(own, opp, sq, get_flips(own, opp, sq))
+        children.append((sq, new_opp, new_own))
+    if workers <= 1:
+        return {sq: perft(child_own, child_opp, depth - 1) for sq, child_own, child_opp in children}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        counts = executor.map(
+            perft, [child[1] for child in children], [child[2] for child in children], [depth - 1] * len(children)
+        )
+        return {child[0]: count for child, count in zip(children, counts)}
+
+
+def parallel_perft(own, opp, depth, workers):
+    return sum(divide(own, opp, depth, workers).values())
+
+
+def parse_position(text):
+    # "black,white[,w]" with hex bitboards; black moves unless the third field is "w".
+    fields = text.split(',')
+    if len(fields) not in (2, 3):
+        raise ValueError(f"Bad position: {text!r}")
+    black, white = int(fields[0], 16), int(fields[1], 16)
+    black_to_move = len(fields) == 2 or fields[2].strip().lower() != 'w'
+    return (black, white) if black_to_move else (white, black)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count game-tree leaves to a fixed depth (perft).")
+    parser.add_argument('depth', type=int)
+    parser.add_argument('-j', '--workers', type=int, default=1, help="split root moves across processes")
+    parser.add_argument('--position', help="black,white[,w] as hex bitboards (default: start position)")
+    parser.add_argument('--divide', action='store_true', help="print the count below each root move")
+    args = parser.parse_args()
+
+    own, opp = parse_position(args.position) if args.position else (START_BLACK, START_WHITE)
+    start = time.perf_counter()
+    if args.divide:
+        counts = divide(own, opp, args.depth, args.workers)
+        root_is_leaf = args.depth == 0 or not (get_moves(own, opp) or get_moves(opp, own))
+        for sq, count in counts.items():
+            if sq is None:
+                move = 'leaf' if root_is_leaf else 'pass'
+            else:
+                move = 'abcdefgh'[sq % 8] + str(sq // 8 + 1)
+            print(f"{move}: {count}")
+        total = sum(counts.values())
+    else:
+        total = parallel_perft(own, opp, args.depth, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"perft({args.depth}) = {total} in {elapsed:.3f}s ({total / elapsed if elapsed else 0:,.0f} leaves/s)")
+
+    if not args.position and args.depth in KNOWN_COUNTS and total != KNOWN_COUNTS[args.depth]:
+        print(f"MISMATCH: expected {KNOWN_COUNTS[args.depth]}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
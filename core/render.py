@@ -0,0 +1,123 @@
+import threading
+from collections import OrderedDict
+
+from telebot import types
+
+import callbacks
+
+MARKUP_CACHE_SIZE = 4096
+SENT_CACHE_SIZE = 16384
+
+
+class LRUCache:
+    def __init__(self, size):
+        self.size = size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.get(key)
+            if value is not None:
+                self.items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            if len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def pop(self, key):
+        with self.lock:
+            return self.items.pop(key, None)
+
+
+def create_board_string(game, mode):
+    score = game.get_score()
+    p1_score = score.get(game.player_black, 0)
+    p2_score = score.get(game.player_white, 0)
+
+    if mode in ["ai", "2p", "rnd"]:
+        current_player_name = game.get_current_player_name() or "Player"
+        turn_text = f"{current_player_name}'s turn ({game.current_player})"
+    else:
+        turn_text = ""
+
+    return f"Score: ⚫️ {p1_score} - {p2_score} ⚪️\n{turn_text}"
+
+
+def build_board_keyboard(game, mode, game_id):
+    markup = types.InlineKeyboardMarkup(row_width=8)
+    valid_moves = []
+
+    is_my_turn = False
+    if mode == 'ai':
+        is_my_turn = (game.current_player == game.player_black)
+    else:
+        is_my_turn = True
+
+    if is_my_turn:
+        valid_moves = game.get_valid_moves(game.current_player)
+
+    board = game.board
+    buttons = []
+    for r in range(game.board_size):
+        row_buttons = []
+        for c in range(game.board_size):
+            text_btn = board[r][c]
+            cb_data = callbacks.encode(callbacks.MOVE, mode, game_id, r, c)
+            if text_btn == game.empty_square and (r, c) in valid_moves:
+                text_btn = '🔷'
+            row_buttons.append(types.InlineKeyboardButton(text_btn, callback_data=cb_data))
+        buttons.append(row_buttons)
+
+    markup.keyboard = buttons
+    markup.add(
+        types.InlineKeyboardButton(
+            "❌ Surrender",
+            callback_data=callbacks.encode(callbacks.FORFEIT, mode, game_id)
+        )
+    )
+    return markup
+
+
+class BoardRenderer:
+    # Caches serialized keyboards per (game, mode, position, side to move) and
+    # remembers what each message currently shows, so unchanged boards are
+    # neither rebuilt nor sent again. bot only needs edit_message_text, so a
+    # Dispatcher can stand in for the TeleBot.
+    def __init__(self, bot, cache_size=MARKUP_CACHE_SIZE, sent_size=SENT_CACHE_SIZE):
+        self.bot = bot
+        self.markups = LRUCache(cache_size)
+        self.sent = LRUCache(sent_size)
+        self.edits = 0
+        self.skipped_edits = 0
+
+    def keyboard(self, game, mode, game_id):
+        key = (game_id, mode, game.black, game.white, game.current_player)
+        markup = self.markups.get(key)
+        if markup is None:
+            markup = build_board_keyboard(game, mode, game_id).to_json()
+            self.markups.put(key, markup)
+        return markup
+
+    def edit(self, text, chat_id=None, message_id=None, inline_message_id=None, reply_markup=None):
+        target = inline_message_id or (chat_id, message_id)
+        if self.sent.get(target) == (text, reply_markup):
+            self.skipped_edits += 1
+            return False
+        self.bot.edit_message_text(
+            text, chat_id, message_id, inline_message_id=inline_message_id, reply_markup=reply_markup
+        )
+        self.edits += 1
+        self.sent.put(target, (text, reply_markup))
+        return True
+
+    def forget(self, chat_id=None, message_id=None, inline_message_id=None):
+        self.sent.pop(inline_message_id or (chat_id, message_id))
+
+    def finish(self, text, chat_id=None, message_id=None, inline_message_id=None):
+        self.forget(chat_id, message_id, inline_message_id)
+        self.bot.edit_message_text(text, chat_id, message_id, inline_message_id=inline_message_id, reply_markup=None)
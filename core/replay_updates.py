@@ -0,0 +1,145 @@
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import callbacks
+from webhook import SECRET_HEADER
+
+# Posts recorded updates (one JSON object per line, as written by
+# WEBHOOK_RECORD) to a bot running in webhook mode, e.g.:
+#   WEBHOOK_URL=http://127.0.0.1:8443/ WEBHOOK_SECRET=s TELEGRAM_API_URL=... python core/bot.py
+#   python core/replay_updates.py updates.jsonl --secret s --repeat 100 -c 16
+# Each repeat is a session that moves user and chat ids to a fresh range and
+# posts the file in order, so one recording plays as many independent users.
+#
+# Board buttons carry a game handle. With --game-id-seed matching the bot's
+# GAME_ID_SEED, AI game handles are recomputed from the pressed message, so
+# whole AI games replay. That also needs the moves the AI made when recording:
+# run the bot with AI_TIME_LIMIT=0 and the same AI_MAX_DEPTH and opening book,
+# and leave --delay long enough for each reply (AI_MOVE_DELAY plus the search).
+# fixtures/ai_game.jsonl is one full game against AI_MAX_DEPTH=2 with no
+# opening book; with BOARD_DELAY, AI_MOVE_DELAY and PASS_DELAY at 0.2, use
+# --delay 0.6. Games against random opponents or friends are paired by
+# timing and inline message ids, and cannot be replayed.
+
+ID_STRIDE = 1_000_000
+
+
+def load_updates(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def shift_ids(value, offset):
+    # A copy of an update with every user and chat id moved by offset.
+    if isinstance(value, list):
+        return [shift_ids(item, offset) for item in value]
+    if not isinstance(value, dict):
+        return value
+    shifted = {}
+    for key, item in value.items():
+        if key in ('from', 'chat') and isinstance(item, dict) and 'id' in item:
+            item = dict(item, id=item['id'] + offset)
+        elif key == 'chat_id' and isinstance(item, int):
+            item += offset
+        shifted[key] = shift_ids(item, offset)
+    return shifted
+
+
+def rehandle(update, seed):
+    # Points an AI board button at the handle a bot with GAME_ID_SEED=seed
+    # gives the game shown on that message.
+    query = update.get('callback_query')
+    if not query or 'message' not in query:
+        return update
+    data = callbacks.decode(query.get('data', ''))
+    if data is None or data.mode != 'ai' or data.action not in (callbacks.MOVE, callbacks.FORFEIT):
+        return update
+    message = query['message']
+    game_id = callbacks.seeded_handle(seed, message['chat']['id'], message['message_id'])
+    query['data'] = callbacks.encode(data.action, data.mode, game_id, data.row, data.col)
+    return update
+
+
+def session(updates, index, seed=None):
+    # Repeat index of update i gets update_id index * len(updates) + i + 1.
+    for i, update in enumerate(updates):
+        update = shift_ids(update, index * ID_STRIDE)
+        update['update_id'] = index * len(updates) + i + 1
+        if seed is not None:
+            update = rehandle(update, seed)
+        yield update
+
+
+def post(url, secret, update, retry_busy):
+    body = json.dumps(update).encode('utf-8')
+    start = time.perf_counter()
+    while True:
+        request = urllib.request.Request(
+            url, data=body, headers={'Content-Type': 'application/json', SECRET_HEADER: secret}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+            if status == 503 and retry_busy:
+                # Back off like Telegram does when the bot refuses an update.
+                time.sleep(float(e.headers.get('Retry-After') or 1))
+                continue
+        except OSError:
+            status = 'error'
+        return status, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Post recorded updates to a bot running in webhook mode.")
+    parser.add_argument('updates', help="JSONL file with one Update per line")
+    parser.add_argument('--url', default='http://127.0.0.1:8443/')
+    parser.add_argument('--secret', default='')
+    parser.add_argument('--repeat', type=int, default=1, help="replay the file this many times as new users")
+    parser.add_argument('-c', '--concurrency', type=int, default=1, help="sessions replayed at once")
+    parser.add_argument('--delay', type=float, default=0.0, help="seconds between requests of a session")
+    parser.add_argument('--game-id-seed', help="the bot's GAME_ID_SEED, to replay AI games")
+    parser.add_argument('--no-retry', action='store_true', help="count 503s instead of retrying them")
+    args = parser.parse_args()
+
+    updates = load_updates(args.updates)
+    statuses = Counter()
+    latencies = []
+    lock = threading.Lock()
+
+    def replay(index):
+        for update in session(updates, index, args.game_id_seed):
+            status, elapsed = post(args.url, args.secret, update, not args.no_retry)
+            with lock:
+                statuses[status] += 1
+                latencies.append(elapsed)
+            if args.delay:
+                time.sleep(args.delay)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(replay, range(args.repeat)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    total = len(latencies)
+    p50 = latencies[total // 2] if total else 0.0
+    p99 = latencies[min(total - 1, total * 99 // 100)] if total else 0.0
+    print(
+        f"{total} updates in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f}/s), "
+        f"p50 {1000 * p50:.1f}ms, p99 {1000 * p99:.1f}ms, status {dict(statuses)}"
+    )
+    if set(statuses) - {200}:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
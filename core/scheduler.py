@@ -0,0 +1,65 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def run_task(func, args, on_error=None):
+    # Calls func(*args) for a worker thread, which must survive the task
+    # failing: on_error(func, exception) replaces the default printed message.
+    try:
+        func(*args)
+    except Exception as e:
+        if on_error is not None:
+            on_error(func, e)
+        else:
+            print(f"Error in {getattr(func, '__name__', func)}: {e}")
+
+
+class Scheduler:
+    def __init__(self, workers=4, on_error=None):
+        # on_error is passed to run_task.
+        self.on_error = on_error
+        self._queue = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scheduler')
+        self._thread = None
+        self._stopped = False
+
+    def call_later(self, delay, func, *args):
+        entry = [time.monotonic() + delay, next(self._counter), func, args]
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='scheduler', daemon=True)
+                self._thread.start()
+            heapq.heappush(self._queue, entry)
+            self._condition.notify()
+        return entry
+
+    def call_soon(self, func, *args):
+        return self.call_later(0, func, *args)
+
+    def cancel(self, entry):
+        # Cancelled entries stay in the heap and are skipped when they come due.
+        with self._condition:
+            entry[2] = None
+
+    def shutdown(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._executor.shutdown(wait=True)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped and (not self._queue or self._queue[0][0] > time.monotonic()):
+                    timeout = self._queue[0][0] - time.monotonic() if self._queue else None
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    return
+                _, _, func, args = heapq.heappop(self._queue)
+            if func is not None:
+                self._executor.submit(run_task, func, args, self.on_error)
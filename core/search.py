@@ -0,0 +1,237 @@
+import time
+
+from bitboard import apply_move, get_flips, get_moves, iter_squares, popcount
+from book import shared_book
+from endgame import ENDGAME_EMPTIES, ENDGAME_SHARE, EndgameSolver, EndgameTimeout
+from evaluation import WEIGHTS, Evaluator
+from transposition import EXACT, LOWER, UPPER, TranspositionTable, game_table, shared_table, zobrist_hash
+
+DEFAULT_TIME_LIMIT = 0.2
+MAX_DEPTH = 60
+
+# A finished game outweighs any heuristic score; the disc difference breaks ties.
+# Default evaluations stay under about 1700 (squares ~930 plus 10 x 64 for
+# stability and 2 x 64 for frontier), so this leaves room for much larger
+# weights.
+WIN_SCORE = 100000
+INFINITY = float('inf')
+# Nodes searched between two checks of the deadline.
+CHECK_INTERVAL = 1024
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def final_score(own, opp):
+    diff = popcount(own) - popcount(opp)
+    if diff > 0:
+        return WIN_SCORE + diff
+    if diff < 0:
+        return -WIN_SCORE + diff
+    return 0
+
+
+def order_moves(moves, first=None):
+    ordered = sorted(iter_squares(moves), key=WEIGHTS.__getitem__, reverse=True)
+    if first is not None and first in ordered:
+        ordered.remove(first)
+        ordered.insert(0, first)
+    return ordered
+
+
+class Searcher:
+    def __init__(
+        self, time_limit=DEFAULT_TIME_LIMIT, max_depth=MAX_DEPTH, tt=None,
+        endgame_empties=ENDGAME_EMPTIES, endgame_time_limit=None, evaluator=None,
+        batch_leaves=False
+    ):
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.evaluator = evaluator if evaluator is not None else Evaluator()
+        # Scoring all leaves of a depth 1 node in one batch gives the same
+        # result but skips the cutoffs between them; it only pays off when
+        # evaluate_batch is much cheaper per position than single calls.
+        self.batch_leaves = batch_leaves
+        self.endgame_empties = endgame_empties
+        # The solver's budget comes out of time_limit (ENDGAME_SHARE of it by
+        # default), so a move never takes longer than time_limit.
+        self.endgame_time_limit = endgame_time_limit
+        self.nodes = 0
+        self.depth_reached = 0
+        self.score = None
+        self.solved = False
+        self.deadline = INFINITY
+        self.next_check = CHECK_INTERVAL
+
+    def search(self, own, opp):
+        moves = get_moves(own, opp)
+        if not moves:
+            return None
+
+        self.nodes = 0
+        self.depth_reached = 0
+        self.score = None
+        self.solved = False
+
+        start = time.perf_counter()
+        empties = 64 - popcount(own | opp)
+        if empties <= self.endgame_empties:
+            budget = self.endgame_time_limit
+            if budget is None:
+                budget = self.time_limit * ENDGAME_SHARE
+            solver = EndgameSolver(budget)
+            try:
+                self.score, best_move = solver.solve(own, opp)
+                self.solved = True
+                return best_move
+            except EndgameTimeout:
+                pass
+            finally:
+                self.nodes += solver.nodes
+
+        self.deadline = start + self.time_limit if self.time_limit else INFINITY
+        self.next_check = self.nodes + CHECK_INTERVAL
+        self.tt.new_search()
+
+        entry = self.tt.probe(zobrist_hash(own, opp))
+        root_moves = order_moves(moves, entry[4] if entry else None)
+        best_move = root_moves[0]
+        for depth in range(1, min(self.max_depth, empties) + 1):
+            try:
+                score, move = self._search_root(own, opp, root_moves, depth)
+            except SearchTimeout:
+                break
+            best_move = move
+            self.score = score
+            self.depth_reached = depth
+            root_moves.remove(move)
+            root_moves.insert(0, move)
+        return best_move
+
+    def _search_root(self, own, opp, root_moves, depth):
+        alpha = -INFINITY
+        best_move = root_moves[0]
+        for sq in root_moves:
+            flips = get_flips(own, opp, sq)
+            new_own, new_opp = apply_move(own, opp, sq, flips)
+            score = -self._negamax(new_opp, new_own, depth - 1, -INFINITY, -alpha)
+            if score > alpha:
+                alpha = score
+                best_move = sq
+        self.tt.store(zobrist_hash(own, opp), depth, EXACT, alpha, best_move)
+        return alpha, best_move
+
+    def _negamax(self, own, opp, depth, alpha, beta):
+        self.nodes += 1
+        if self.nodes >= self.next_check:
+            self.next_check = self.nodes + CHECK_INTERVAL
+            if time.perf_counter() > self.deadline:
+                raise SearchTimeout()
+
+        if depth == 0:
+            return self.evaluator(own, opp)
+
+        key = zobrist_hash(own, opp)
+        entry = self.tt.probe(key)
+        hash_move = None
+        if entry is not None:
+            _, entry_depth, bound, score, hash_move, _ = entry
+            if entry_depth >= depth:
+                if bound == EXACT:
+                    return score
+                if bound == LOWER and score >= beta:
+                    return score
+                if bound == UPPER and score <= alpha:
+                    return score
+
+        moves = get_moves(own, opp)
+        if not moves:
+            if not get_moves(opp, own):
+                return final_score(own, opp)
+            return -self._negamax(opp, own, depth - 1, -beta, -alpha)
+
+        alpha_orig = alpha
+        if depth == 1 and self.batch_leaves:
+            best, best_move = self._score_children(own, opp, moves, hash_move)
+        else:
+            best, best_move = self._search_children(own, opp, moves, hash_move, depth, alpha, beta)
+
+        if best <= alpha_orig:
+            bound = UPPER
+        elif best >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.tt.store(key, depth, bound, best, best_move)
+        return best
+
+    def _search_children(self, own, opp, moves, hash_move, depth, alpha, beta):
+        best = -INFINITY
+        best_move = None
+        for sq in order_moves(moves, hash_move):
+            flips = get_flips(own, opp, sq)
+            new_own, new_opp = apply_move(own, opp, sq, flips)
+            score = -self._negamax(new_opp, new_own, depth - 1, -beta, -alpha)
+            if score > best:
+                best = score
+                best_move = sq
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best, best_move
+
+    def _score_children(self, own, opp, moves, hash_move):
+        # The children of a depth 1 node are all leaves, so they are scored in
+        # one batch call instead of one evaluation per recursive call.
+        squares = order_moves(moves, hash_move)
+        children = []
+        for sq in squares:
+            new_own, new_opp = apply_move(own, opp, sq, get_flips(own, opp, sq))
+            children.append((new_opp, new_own))
+        self.nodes += len(children)
+        scores = self.evaluator.evaluate_batch(children)
+        best = -INFINITY
+        best_move = None
+        for sq, score in zip(squares, scores):
+            if -score > best:
+                best = -score
+                best_move = sq
+        return best, best_move
+
+
+def search_position(
+    black, white, black_to_move, time_limit=DEFAULT_TIME_LIMIT, max_depth=MAX_DEPTH,
+    endgame_empties=ENDGAME_EMPTIES, endgame_time_limit=None, book_path=None, with_stats=False,
+    game_id=None, shared_tt=False
+):
+    # Entry point for AI worker processes. It takes the compact board form from
+    # Othello.to_compact. The process keeps a transposition table per game_id
+    # across that game's moves, or one table for every game with shared_tt
+    # (or no game_id). Positions in the opening book at book_path are answered
+    # without searching. A fixed-depth search (time_limit=0) gets a table of
+    # its own, so its move does not depend on what the process searched
+    # before. with_stats returns (move, {'nodes', 'depth', 'solved', 'book'})
+    # instead of just the move.
+    own, opp = (black, white) if black_to_move else (white, black)
+    stats = {'nodes': 0, 'depth': 0, 'solved': False, 'book': False}
+    best_move = None
+    if book_path:
+        best_move = shared_book(book_path).lookup(own, opp)
+        stats['book'] = best_move is not None
+    if best_move is None:
+        if not time_limit:
+            tt = TranspositionTable()
+        elif shared_tt or game_id is None:
+            tt = shared_table()
+        else:
+            tt = game_table(game_id)
+        searcher = Searcher(
+            time_limit, max_depth, tt, endgame_empties=endgame_empties, endgame_time_limit=endgame_time_limit
+        )
+        best_move = searcher.search(own, opp)
+        stats.update(nodes=searcher.nodes, depth=searcher.depth_reached, solved=searcher.solved)
+    move = None if best_move is None else divmod(best_move, 8)
+    return (move, stats) if with_stats else move
@@ -0,0 +1,179 @@
+import argparse
+import json
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import START_BLACK, START_WHITE, apply_move, get_flips, get_moves, iter_squares, popcount
+from book import format_moves, shared_book
+from endgame import ENDGAME_EMPTIES
+from evaluation import DEFAULT_WEIGHTS, FEATURES, Evaluator
+from search import DEFAULT_TIME_LIMIT, MAX_DEPTH, Searcher
+from transposition import TranspositionTable
+
+RANDOM_PLIES = 4
+SEARCH_OPTIONS = {
+    'time_limit': float,
+    'max_depth': int,
+    'endgame_empties': int,
+    'endgame_time_limit': float,
+    'book': str,
+}
+
+
+def parse_player(spec):
+    # "time_limit=0.1,max_depth=6,mobility=5" -> settings dict. Feature names
+    # set evaluation weights on top of the defaults. A fixed-depth player
+    # (time_limit=0) must give max_depth, or it would search to the end.
+    player = {
+        'time_limit': DEFAULT_TIME_LIMIT,
+        'max_depth': MAX_DEPTH,
+        'endgame_empties': ENDGAME_EMPTIES,
+        'endgame_time_limit': None,
+        'book': None,
+        'weights': dict(DEFAULT_WEIGHTS),
+    }
+    given = set()
+    for item in filter(None, spec.split(',')):
+        name, _, value = item.partition('=')
+        name = name.strip()
+        if name in SEARCH_OPTIONS:
+            player[name] = SEARCH_OPTIONS[name](value)
+            given.add(name)
+        elif name in FEATURES:
+            player['weights'][name] = float(value)
+        else:
+            raise ValueError(f"Unknown player setting: {name}")
+    if not player['time_limit'] and 'max_depth' not in given:
+        raise ValueError("time_limit=0 needs max_depth")
+    # endgame_time_limit None takes the solver budget from time_limit, so a
+    # fixed-depth player (time_limit=0) also solves endgames without a time
+    # limit and its games do not depend on machine load.
+    return player
+
+
+def play_game(index, seed, players, random_plies=RANDOM_PLIES):
+    # Plays one game; players[0] is black in even games and white in odd ones.
+    # The random opening only depends on (seed, index), so a run is
+    # reproducible whatever the process count. Searches are exact repeats
+    # only for fixed-depth players (time_limit=0 with max_depth).
+    rng = random.Random(seed * 1_000_003 + index)
+    sides = (0, 1) if index % 2 == 0 else (1, 0)
+    searchers = []
+    for player in players:
+        searchers.append(Searcher(
+            player['time_limit'], player['max_depth'], TranspositionTable(),
+            endgame_empties=player['endgame_empties'], endgame_time_limit=player['endgame_time_limit'],
+            evaluator=Evaluator(player['weights'])
+        ))
+
+    own, opp, black_to_move = START_BLACK, START_WHITE, True
+    moves, times = [], []
+    nodes = [0, 0]
+    think = [0.0, 0.0]
+    searched = [0, 0]
+    while True:
+        legal = get_moves(own, opp)
+        if not legal:
+            if not get_moves(opp, own):
+                break
+            own, opp, black_to_move = opp, own, not black_to_move
+            continue
+
+        side = sides[0] if black_to_move else sides[1]
+        start = time.perf_counter()
+        if len(moves) < random_plies:
+            sq = rng.choice(list(iter_squares(legal)))
+        else:
+            book = players[side]['book']
+            sq = shared_book(book).lookup(own, opp) if book else None
+            if sq is None:
+                searcher = searchers[side]
+                sq = searcher.search(own, opp)
+                nodes[side] += searcher.nodes
+            elapsed = time.perf_counter() - start
+            think[side] += elapsed
+            searched[side] += 1
+            times.append(round(elapsed * 1000, 2))
+        moves.append(sq)
+        own, opp = apply_move(own, opp, sq, get_flips(own, opp, sq))
+        own, opp, black_to_move = opp, own, not black_to_move
+
+    black, white = (own, opp) if black_to_move else (opp, own)
+    black_discs, white_discs = popcount(black), popcount(white)
+    if black_discs == white_discs:
+        winner = None
+    else:
+        winner = sides[0] if black_discs > white_discs else sides[1]
+    return {
+        'index': index,
+        'seed': seed,
+        'black': sides[0],
+        'white': sides[1],
+        'moves': format_moves(moves),
+        'random_plies': min(random_plies, len(moves)),
+        'score': {'black': black_discs, 'white': white_discs},
+        'winner': winner,
+        'nodes': nodes,
+        'searched_moves': searched,
+        'think_time': [round(t, 4) for t in think],
+        'move_times_ms': times,
+    }
+
+
+def run(games, players, seed=0, workers=1, random_plies=RANDOM_PLIES):
+    # Yields finished games in index order while later ones are still playing.
+    indices = range(games)
+    args = (indices, [seed] * games, [players] * games, [random_plies] * games)
+    if workers <= 1:
+        yield from map(play_game, *args)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(play_game, *args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play AI settings against each other and write the games as JSONL.")
+    parser.add_argument('-a', '--player-a', default='', help="settings, e.g. time_limit=0.1,max_depth=6,mobility=5")
+    parser.add_argument('-b', '--player-b', default='')
+    parser.add_argument('-n', '--games', type=int, default=10)
+    parser.add_argument('-j', '--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--random-plies', type=int, default=RANDOM_PLIES)
+    parser.add_argument('-o', '--output', help="JSONL file (default: stdout)")
+    args = parser.parse_args()
+
+    try:
+        players = (parse_player(args.player_a), parse_player(args.player_b))
+    except ValueError as e:
+        parser.error(str(e))
+    out = open(args.output, 'w') if args.output else sys.stdout
+    wins = [0, 0]
+    draws = 0
+    think = [0.0, 0.0]
+    searched = [0, 0]
+    try:
+        for game in run(args.games, players, args.seed, args.workers, args.random_plies):
+            out.write(json.dumps(game) + '\n')
+            out.flush()
+            if game['winner'] is None:
+                draws += 1
+            else:
+                wins[game['winner']] += 1
+            for side in (0, 1):
+                think[side] += game['think_time'][side]
+                searched[side] += game['searched_moves'][side]
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(
+        f"A {wins[0]} - B {wins[1]} ({draws} draws) | "
+        f"ms/move A {1000 * think[0] / max(searched[0], 1):.1f}, B {1000 * think[1] / max(searched[1], 1):.1f}",
+        file=sys.stderr
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+
+SESSION_TTL = 60 * 60
+MAX_SESSIONS = 10000
+
+
+class SessionRegistry:
+    # Live games keyed by game id, ordered by last activity. Idle sessions
+    # expire after their TTL and the least recently used one is evicted once
+    # max_sessions is exceeded; on_remove(game_id, game, reason) is called for
+    # both so callers can drop related state.
+    def __init__(self, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS, on_remove=None):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.on_remove = on_remove
+        self.sessions = OrderedDict()
+        self.lock = threading.RLock()
+        self.expired = 0
+        self.evicted = 0
+
+    def add(self, game_id, game, ttl=None):
+        with self.lock:
+            self.sessions[game_id] = [game, time.monotonic(), ttl or self.ttl]
+            self.sessions.move_to_end(game_id)
+            overflow = []
+            while len(self.sessions) > self.max_sessions:
+                old_id, (old_game, _, _) = self.sessions.popitem(last=False)
+                overflow.append((old_id, old_game))
+            self.evicted += len(overflow)
+        for old_id, old_game in overflow:
+            self._removed(old_id, old_game, 'evicted')
+
+    def __setitem__(self, game_id, game):
+        self.add(game_id, game)
+
+    def get(self, game_id, default=None):
+        with self.lock:
+            entry = self.sessions.get(game_id)
+            if entry is None:
+                return default
+            entry[1] = time.monotonic()
+            self.sessions.move_to_end(game_id)
+            return entry[0]
+
+    def __getitem__(self, game_id):
+        game = self.get(game_id)
+        if game is None:
+            raise KeyError(game_id)
+        return game
+
+    def touch(self, game_id, ttl=None):
+        with self.lock:
+            entry = self.sessions.get(game_id)
+            if entry is None:
+                return False
+            entry[1] = time.monotonic()
+            if ttl is not None:
+                entry[2] = ttl
+            self.sessions.move_to_end(game_id)
+            return True
+
+    def pop(self, game_id, default=None):
+        with self.lock:
+            entry = self.sessions.pop(game_id, None)
+        return default if entry is None else entry[0]
+
+    def __contains__(self, game_id):
+        with self.lock:
+            return game_id in self.sessions
+
+    def __len__(self):
+        with self.lock:
+            return len(self.sessions)
+
+    def sweep(self):
+        now = time.monotonic()
+        with self.lock:
+            stale = [
+                (game_id, game)
+                for game_id, (game, last_active, ttl) in self.sessions.items()
+                if now - last_active > ttl
+            ]
+            for game_id, _ in stale:
+                del self.sessions[game_id]
+            self.expired += len(stale)
+        for game_id, game in stale:
+            self._removed(game_id, game, 'expired')
+        return len(stale)
+
+    def metrics(self):
+        with self.lock:
+            return {'live': len(self.sessions), 'expired': self.expired, 'evicted': self.evicted}
+
+    def _removed(self, game_id, game, reason):
+        if self.on_remove is not None:
+            try:
+                self.on_remove(game_id, game, reason)
+            except Exception as e:
+                print(f"Error removing session {game_id}: {e}")
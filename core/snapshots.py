@@ -0,0 +1,138 @@
+import sqlite3
+import struct
+
+from callbacks import MODES
+from game import Othello
+from stats import WriteBehindStore, open_database
+
+SNAPSHOT_INTERVAL = 1.0
+
+# Snapshot layout, version 1 (big endian):
+#   version:u8  mode:u8  flags:u8  black:u64  white:u64  player1_id:i64  player2_id:i64
+#   refs:u8, then refs x (chat_id:i64  message_id:i64)
+#   player1_name, player2_name, inline_message_id: each len:u8 + UTF-8 bytes
+# A player id of 0 means "none"; Telegram never assigns it.
+VERSION = 1
+_HEADER = struct.Struct('>BBBQQqqB')
+_REF = struct.Struct('>qq')
+BLACK_TO_MOVE = 1
+_MODE_CODES = {mode: code for code, mode in enumerate(MODES)}
+
+
+def _pack_text(text):
+    data = (text or '').encode('utf-8')[:255]
+    return bytes((len(data),)) + data
+
+
+def _unpack_text(data, offset):
+    length = data[offset]
+    offset += 1
+    return data[offset:offset + length].decode('utf-8', 'ignore'), offset + length
+
+
+def encode_game(game, mode, refs=(), inline_message_id=None):
+    # refs are the (chat_id, message_id) pairs showing the board: one for an
+    # AI game, black then white for a random game, none for an inline game.
+    flags = BLACK_TO_MOVE if game.current_player == game.player_black else 0
+    parts = [_HEADER.pack(
+        VERSION, _MODE_CODES[mode], flags, game.black, game.white,
+        game.player1_id or 0, game.player2_id or 0, len(refs)
+    )]
+    parts.extend(_REF.pack(chat_id, message_id) for chat_id, message_id in refs)
+    parts.append(_pack_text(game.player1_name))
+    parts.append(_pack_text(game.player2_name))
+    parts.append(_pack_text(inline_message_id))
+    return b''.join(parts)
+
+
+def decode_game(data):
+    # Returns (game, mode, refs, inline_message_id); raises ValueError for a
+    # snapshot this version cannot read.
+    try:
+        version, mode, flags, black, white, player1_id, player2_id, count = _HEADER.unpack_from(data)
+        if version != VERSION or mode >= len(MODES):
+            raise ValueError(f"Unsupported snapshot version {version}, mode {mode}")
+        offset = _HEADER.size
+        refs = []
+        for _ in range(count):
+            refs.append(_REF.unpack_from(data, offset))
+            offset += _REF.size
+        player1_name, offset = _unpack_text(data, offset)
+        player2_name, offset = _unpack_text(data, offset)
+        inline_message_id, offset = _unpack_text(data, offset)
+    except (struct.error, IndexError) as e:
+        raise ValueError(f"Truncated snapshot: {e}") from None
+
+    game = Othello(
+        player1_id=player1_id or None,
+        player1_name=player1_name or None,
+        player2_id=player2_id or None,
+        player2_name=player2_name or None
+    )
+    game.set_position(black, white, bool(flags & BLACK_TO_MOVE))
+    return game, MODES[mode], refs, inline_message_id or None
+
+
+class SnapshotStore(WriteBehindStore):
+    # Live games by id in SQLite. save() and delete() only record the latest
+    # state per game in memory; a background thread writes everything pending
+    # in one transaction every flush_interval seconds, so saving on every
+    # move costs a dict assignment on the game's thread.
+    NAME = 'game snapshots'
+    THREAD_NAME = 'snapshot-flush'
+    FLUSH_ERRORS = (sqlite3.Error,)
+    SCHEMA = "CREATE TABLE IF NOT EXISTS snapshots (game_id INTEGER PRIMARY KEY, state BLOB NOT NULL)"
+    UPSERT = (
+        "INSERT INTO snapshots (game_id, state) VALUES (?, ?) "
+        "ON CONFLICT(game_id) DO UPDATE SET state = excluded.state"
+    )
+    DELETE = "DELETE FROM snapshots WHERE game_id = ?"
+
+    def __init__(self, path, flush_interval=SNAPSHOT_INTERVAL):
+        super().__init__(flush_interval)
+        self.path = path
+        self.pending = {}
+        self.conn = None
+
+    def load(self):
+        conn = open_database(self.path)
+        conn.execute(self.SCHEMA)
+        self.conn = conn
+        return dict(conn.execute("SELECT game_id, state FROM snapshots"))
+
+    def save(self, game_id, state):
+        with self.lock:
+            self.pending[game_id] = state
+
+    def delete(self, game_id):
+        with self.lock:
+            self.pending[game_id] = None
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                pending, self.pending = self.pending, {}
+            if not pending or self.conn is None:
+                return
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(
+                    self.UPSERT, [(game_id, state) for game_id, state in pending.items() if state is not None]
+                )
+                self.conn.executemany(
+                    self.DELETE, [(game_id,) for game_id, state in pending.items() if state is None]
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                with self.lock:
+                    # Keep anything saved since, restore the rest for the next try.
+                    pending.update(self.pending)
+                    self.pending = pending
+                raise
+
+    def close(self):
+        super().close()
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
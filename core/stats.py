@@ -0,0 +1,230 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+
+FLUSH_INTERVAL = 5.0
+MAX_DIRTY = 100
+RESULTS = ('win', 'loss', 'draw')
+
+
+def empty_stats():
+    return {'win': 0, 'loss': 0, 'draw': 0, 'total': 0}
+
+
+def open_database(path):
+    # Autocommit connection shared by threads; WAL lets reads run while a
+    # batch is written, and NORMAL sync is safe with WAL.
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class WriteBehindStore:
+    # Base for stores that keep changes in memory and have a background
+    # thread write them with flush() every flush_interval seconds, or sooner
+    # after wake(). close() stops the thread and flushes what is left.
+    # Errors in FLUSH_ERRORS are printed and the next flush tries again.
+    NAME = 'data'
+    THREAD_NAME = 'flush'
+    FLUSH_ERRORS = (OSError,)
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def flush(self):
+        raise NotImplementedError
+
+    def wake(self):
+        self.wakeup.set()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name=self.THREAD_NAME, daemon=True)
+            self.thread.start()
+
+    def close(self):
+        self.stopped.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.flush()
+
+    def _run(self):
+        while not self.stopped.is_set():
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except self.FLUSH_ERRORS as e:
+                print(f"Error saving {self.NAME}: {e}")
+
+
+def create_stats_store(backend, json_path, db_path):
+    if backend == 'json':
+        return JsonStatsStore(json_path)
+    if backend == 'sqlite':
+        return SqliteStatsStore(db_path, migrate_from=json_path)
+    raise ValueError(f"Unknown stats backend: {backend}")
+
+
+class JsonStatsStore(WriteBehindStore):
+    # Write-behind store: results are recorded in memory and a background
+    # thread rewrites the JSON file every flush_interval seconds, or sooner
+    # once max_dirty results are pending.
+    NAME = 'stats'
+    THREAD_NAME = 'stats-flush'
+
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL, max_dirty=MAX_DIRTY):
+        super().__init__(flush_interval)
+        self.path = path
+        self.max_dirty = max_dirty
+        self.stats = {}
+        self.dirty = 0
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                stats = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            stats = {}
+        with self.lock:
+            self.stats = stats
+            self.dirty = 0
+
+    def get(self, user_id):
+        with self.lock:
+            stats = self.stats.get(str(user_id))
+            return dict(stats) if stats else None
+
+    def record(self, user_id, result):
+        user_id = str(user_id)
+        with self.lock:
+            if user_id not in self.stats:
+                self.stats[user_id] = empty_stats()
+            self.stats[user_id][result] += 1
+            self.stats[user_id]['total'] += 1
+            self.dirty += 1
+            if self.dirty >= self.max_dirty:
+                self.wake()
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                data = json.dumps(self.stats, indent=4)
+                self.dirty = 0
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.stats-', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                with self.lock:
+                    self.dirty += 1
+                raise
+
+
+class SqliteStatsStore:
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS user_stats ("
+        " user_id TEXT PRIMARY KEY,"
+        " win INTEGER NOT NULL DEFAULT 0,"
+        " loss INTEGER NOT NULL DEFAULT 0,"
+        " draw INTEGER NOT NULL DEFAULT 0,"
+        " total INTEGER NOT NULL DEFAULT 0"
+        ") WITHOUT ROWID",
+        "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    )
+    SELECT = "SELECT win, loss, draw, total FROM user_stats WHERE user_id = ?"
+    # One fixed statement per result, so sqlite3's statement cache reuses them.
+    UPSERTS = {
+        result: (
+            f"INSERT INTO user_stats (user_id, {result}, total) VALUES (?, 1, 1) "
+            f"ON CONFLICT(user_id) DO UPDATE SET {result} = {result} + 1, total = total + 1"
+        )
+        for result in RESULTS
+    }
+    MIGRATE = (
+        "INSERT INTO user_stats (user_id, win, loss, draw, total) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(user_id) DO UPDATE SET win = win + excluded.win, loss = loss + excluded.loss, "
+        "draw = draw + excluded.draw, total = total + excluded.total"
+    )
+
+    def __init__(self, path, migrate_from=None):
+        self.path = path
+        self.migrate_from = migrate_from
+        self.lock = threading.Lock()
+        self.conn = None
+
+    def load(self):
+        conn = open_database(self.path)
+        for statement in self.SCHEMA:
+            conn.execute(statement)
+        self.conn = conn
+        if self.migrate_from:
+            self._migrate_json(self.migrate_from)
+
+    def _migrate_json(self, json_path):
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+                return
+            try:
+                with open(json_path, 'r') as f:
+                    stats = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                stats = {}
+
+            rows = [
+                (str(user_id), s.get('win', 0), s.get('loss', 0), s.get('draw', 0), s.get('total', 0))
+                for user_id, s in stats.items()
+            ]
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(self.MIGRATE, rows)
+                self.conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (os.path.abspath(json_path),)
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        if rows:
+            print(f"Migrated stats for {len(rows)} users from {json_path} to {self.path}")
+
+    def get(self, user_id):
+        with self.lock:
+            row = self.conn.execute(self.SELECT, (str(user_id),)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('win', 'loss', 'draw', 'total'), row))
+
+    def record(self, user_id, result):
+        with self.lock:
+            self.conn.execute(self.UPSERTS[result], (str(user_id),))
+
+    def flush(self):
+        pass
+
+    def start(self):
+        pass
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
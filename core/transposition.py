@@ -0,0 +1,107 @@
+import random
+from collections import OrderedDict
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+DEFAULT_SIZE = 1 << 16
+# Tables kept per game by an AI worker process; the game searched least
+# recently loses its table once there are GAME_TABLES.
+GAME_TABLE_SIZE = 1 << 14
+GAME_TABLES = 32
+
+_rng = random.Random(0x07E110)
+_OWN_KEYS = [_rng.getrandbits(64) for _ in range(64)]
+_OPP_KEYS = [_rng.getrandbits(64) for _ in range(64)]
+
+
+def _byte_tables(square_keys):
+    # tables[i][b] is the XOR of the square keys for the discs in byte i of a
+    # bitboard, so hashing costs eight lookups per side instead of 64.
+    tables = []
+    for i in range(8):
+        table = [0] * 256
+        for byte in range(1, 256):
+            low = byte & -byte
+            table[byte] = table[byte ^ low] ^ square_keys[i * 8 + low.bit_length() - 1]
+        tables.append(table)
+    return tables
+
+
+_OWN_TABLES = _byte_tables(_OWN_KEYS)
+_OPP_TABLES = _byte_tables(_OPP_KEYS)
+
+
+def zobrist_hash(own, opp):
+    key = 0
+    for i in range(8):
+        shift = i * 8
+        key ^= _OWN_TABLES[i][(own >> shift) & 0xFF] ^ _OPP_TABLES[i][(opp >> shift) & 0xFF]
+    return key
+
+
+class TranspositionTable:
+    def __init__(self, size=DEFAULT_SIZE):
+        if size < 1 or size & (size - 1):
+            raise ValueError("Transposition table size must be a power of two.")
+        self.size = size
+        self.mask = size - 1
+        self.entries = [None] * size
+        self.generation = 0
+        self.hits = 0
+        self.probes = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def clear(self):
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.hits = 0
+        self.probes = 0
+
+    def probe(self, key):
+        self.probes += 1
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        index = key & self.mask
+        entry = self.entries[index]
+        # Depth-preferred replacement, except that entries left over from an
+        # earlier search are always overwritten so old positions age out.
+        if (
+            entry is None or
+            entry[0] == key or
+            entry[5] != self.generation or
+            depth >= entry[1]
+        ):
+            self.entries[index] = (key, depth, bound, score, move, self.generation)
+
+
+_shared_table = None
+
+
+def shared_table():
+    global _shared_table
+    if _shared_table is None:
+        _shared_table = TranspositionTable()
+    return _shared_table
+
+
+_game_tables = OrderedDict()
+
+
+def game_table(game_id):
+    # The table of one game, kept between its moves.
+    table = _game_tables.pop(game_id, None)
+    if table is None:
+        table = TranspositionTable(GAME_TABLE_SIZE)
+        if len(_game_tables) >= GAME_TABLES:
+            _game_tables.popitem(last=False)
+    _game_tables[game_id] = table
+    return table
@@ -0,0 +1,137 @@
+import hmac
+import json
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot import types
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+WEBHOOK_WORKERS = 4
+QUEUE_SIZE = 1000
+MAX_BODY = 1 << 20
+# Seconds suggested to the client in Retry-After when the queue is full.
+RETRY_AFTER = 1
+# Connections waiting to be accepted; Telegram opens up to max_connections.
+LISTEN_BACKLOG = 128
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    request_queue_size = LISTEN_BACKLOG
+
+
+class WebhookServer:
+    # Receives the updates Telegram pushes to the webhook URL. A request with
+    # the right secret token is queued and answered at once; worker threads
+    # feed the queue to bot.process_new_updates. When the queue is full, or
+    # overloaded() says the game workers are behind, the update is refused
+    # with 503 and Telegram delivers it again later, so a burst waits
+    # upstream instead of piling up in memory.
+    def __init__(
+        self, bot, secret_token, path='/', workers=WEBHOOK_WORKERS, queue_size=QUEUE_SIZE,
+        overloaded=None, record=None, on_error=None
+    ):
+        # record: a file that every accepted update is appended to as one
+        # JSON line, for replay_updates.py. on_error(exception) replaces the
+        # default printed message for failed updates.
+        self.bot = bot
+        self.secret_token = secret_token.encode('utf-8')
+        self.path = path
+        self.overloaded = overloaded
+        self.on_error = on_error
+        self.updates = queue.Queue(queue_size)
+        self.record = open(record, 'a', encoding='utf-8') if record else None
+        self.lock = threading.Lock()
+        self.server = None
+        self.accepted = 0
+        self.rejected = 0
+        self.forbidden = 0
+        self.threads = [
+            threading.Thread(target=self._run, name=f'webhook-{i}', daemon=True) for i in range(workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def pending(self):
+        return self.updates.qsize()
+
+    def serve(self, port, host='0.0.0.0'):
+        webhook = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.split('?')[0] != webhook.path:
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get('Content-Length') or 0)
+                if length > MAX_BODY:
+                    self.send_error(413)
+                    return
+                body = self.rfile.read(length)
+                status = webhook.accept(self.headers.get(SECRET_HEADER, ''), body)
+                self.send_response(status)
+                if status == 503:
+                    self.send_header('Retry-After', str(RETRY_AFTER))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = _HTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, name='webhook-http', daemon=True).start()
+        return self.server
+
+    def accept(self, secret_token, body):
+        # Returns the HTTP status to answer with.
+        if not hmac.compare_digest(secret_token.encode('utf-8'), self.secret_token):
+            self._count('forbidden')
+            return 403
+        try:
+            update = json.loads(body)
+        except ValueError:
+            return 400
+        if not isinstance(update, dict) or 'update_id' not in update:
+            return 400
+        if self.overloaded is not None and self.overloaded():
+            self._count('rejected')
+            return 503
+        try:
+            self.updates.put_nowait(update)
+        except queue.Full:
+            self._count('rejected')
+            return 503
+        with self.lock:
+            self.accepted += 1
+            if self.record is not None:
+                self.record.write(json.dumps(update, ensure_ascii=False) + '\n')
+                self.record.flush()
+        return 200
+
+    def shutdown(self):
+        # Stops taking requests, then lets the workers finish the queue.
+        if self.server is not None:
+            self.server.shutdown()
+        for _ in self.threads:
+            self.updates.put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.record is not None:
+            self.record.close()
+
+    def _run(self):
+        while True:
+            update = self.updates.get()
+            if update is None:
+                return
+            try:
+                self.bot.process_new_updates([types.Update.de_json(update)])
+            except Exception as e:
+                if self.on_error is not None:
+                    self.on_error(e)
+                else:
+                    print(f"Error in webhook update {update.get('update_id')}: {e}")
+
+    def _count(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
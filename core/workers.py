@@ -0,0 +1,48 @@
+import queue
+import threading
+
+from scheduler import run_task
+
+_STOP = object()
+
+
+class ShardedExecutor:
+    # Runs each task on the worker thread that owns its key, so tasks for the
+    # same key (a game) run one at a time and in order, while different keys
+    # spread across the other workers.
+    def __init__(self, shards=8, name='shard', on_error=None):
+        # on_error is passed to run_task.
+        self.on_error = on_error
+        self.name = name
+        self.queues = [queue.Queue() for _ in range(shards)]
+        self.threads = []
+
+    def start(self):
+        # Tasks submitted before start() wait in their queues.
+        if not self.threads:
+            self.threads = [
+                threading.Thread(target=self._run, args=(q,), name=f'{self.name}-{i}', daemon=True)
+                for i, q in enumerate(self.queues)
+            ]
+            for thread in self.threads:
+                thread.start()
+
+    def submit(self, key, func, *args):
+        self.queues[hash(key) % len(self.queues)].put((func, args))
+
+    def pending(self):
+        return sum(q.qsize() for q in self.queues)
+
+    def shutdown(self):
+        for q in self.queues:
+            q.put(_STOP)
+        for thread in self.threads:
+            thread.join()
+
+    def _run(self, tasks):
+        while True:
+            task = tasks.get()
+            if task is _STOP:
+                return
+            func, args = task
+            run_task(func, args, self.on_error)
@@ -0,0 +1,35 @@
+import os
+import random
+import sys
+
+import pytest
+
+# The modules in core/ import each other by their plain names.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core'))
+
+from bitboard import START_BLACK, START_WHITE, apply_move, get_flips, get_moves, iter_squares
+
+
+def playout_positions(games, seed):
+    # Every (own, opp) position, side to move first, of random games.
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(games):
+        own, opp = START_BLACK, START_WHITE
+        while True:
+            moves = get_moves(own, opp)
+            if not moves:
+                if not get_moves(opp, own):
+                    break
+                own, opp = opp, own
+                continue
+            positions.append((own, opp))
+            sq = rng.choice(list(iter_squares(moves)))
+            own, opp = apply_move(own, opp, sq, get_flips(own, opp, sq))
+            own, opp = opp, own
+    return positions
+
+
+@pytest.fixture(scope='session')
+def positions():
+    return playout_positions(20, seed=1)
@@ -0,0 +1,69 @@
+import pytest
+
+from bitboard import apply_move, get_flips, get_moves, iter_squares
+from book import (
+    SQUARE_MAPS, SYMMETRIES, OpeningBook, build_from_games, canonical, format_moves, parse_moves, replay
+)
+
+# After f5 d6 c3 the position has no symmetry, so all eight images differ.
+OPENING = 'f5d6c3'
+
+
+def position_after(moves):
+    own, opp, sq, _ = list(replay(parse_moves(moves)))[-1]
+    own, opp = apply_move(own, opp, sq, get_flips(own, opp, sq))
+    return opp, own
+
+
+def test_symmetries_map_moves_to_moves():
+    own, opp = position_after(OPENING)
+    for index, sym in enumerate(SYMMETRIES):
+        assert get_moves(sym(own), sym(opp)) == sym(get_moves(own, opp))
+        for sq in range(64):
+            assert sym(1 << sq) == 1 << SQUARE_MAPS[index][sq]
+
+
+def test_lookup_from_every_orientation():
+    own, opp = position_after(OPENING)
+    images = {(sym(own), sym(opp)) for sym in SYMMETRIES}
+    assert len(images) == 8
+    assert len({canonical(*image)[0] for image in images}) == 1
+    for sq in iter_squares(get_moves(own, opp)):
+        book = OpeningBook()
+        book.add(own, opp, sq)
+        for index, sym in enumerate(SYMMETRIES):
+            assert book.lookup(sym(own), sym(opp)) == SQUARE_MAPS[index][sq]
+
+
+def test_lookup_misses():
+    own, opp = position_after(OPENING)
+    book = OpeningBook()
+    book.add(own, opp, next(iter_squares(get_moves(own, opp))))
+    assert book.lookup(*position_after('f5d6')) is None
+    assert book.lookup(*position_after(OPENING + 'd3c5')) is None
+
+
+def test_save_and_load(tmp_path):
+    book = build_from_games([parse_moves('f5d6c3d3c4'), parse_moves('f5d6c3d3c4'), parse_moves('f5f6e6f4')])
+    assert len(book) == 5
+    path = str(tmp_path / 'book.bin')
+    book.save(path)
+    loaded = OpeningBook.load(path)
+    assert loaded.entries == book.entries
+    assert loaded.max_discs == book.max_discs
+    own, opp = position_after('f5d6')
+    assert loaded.lookup(own, opp) == parse_moves('c3')[0]
+
+    with open(path, 'r+b') as f:
+        f.truncate(20)
+    with pytest.raises(ValueError):
+        OpeningBook.load(path)
+
+
+def test_move_notation():
+    assert format_moves(parse_moves('F5d6c3')) == OPENING
+    for text in ('f5d', 'i5', 'f9'):
+        with pytest.raises(ValueError):
+            parse_moves(text)
+    with pytest.raises(ValueError):
+        list(replay(parse_moves('a1')))
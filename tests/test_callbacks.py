@@ -0,0 +1,47 @@
+import base64
+import struct
+
+import pytest
+
+import callbacks
+
+ACTIONS = (
+    callbacks.VS_AI, callbacks.RANDOM_QUEUE, callbacks.ACCEPT, callbacks.MOVE, callbacks.FORFEIT, callbacks.RANDOM_CANCEL
+)
+
+
+@pytest.mark.parametrize('action', ACTIONS)
+@pytest.mark.parametrize('mode', callbacks.MODES)
+def test_round_trip(action, mode):
+    for game_id, row, col in ((0, 0, 0), (12345, 2, 3), (2 ** 32 - 1, 7, 7)):
+        data = callbacks.encode(action, mode, game_id, row, col)
+        assert len(data) == callbacks.ENCODED_LENGTH
+        assert callbacks.decode(data) == callbacks.CallbackData(action, mode, game_id, row, col)
+
+
+def test_legacy_buttons():
+    assert callbacks.decode('vs_ai') == callbacks.CallbackData(callbacks.VS_AI, '', 0, 0, 0)
+    assert callbacks.decode('random_queue').action == callbacks.RANDOM_QUEUE
+
+
+def pack(version, action, mode, game_id, square):
+    return base64.urlsafe_b64encode(struct.pack('>BBBIB', version, action, mode, game_id, square)).rstrip(b'=').decode()
+
+
+@pytest.mark.parametrize('data', [
+    '',
+    'move_2_3',
+    '!!!!!!!!!!!',
+    pack(2, callbacks.MOVE, 1, 7, 0),
+    pack(callbacks.VERSION, callbacks.MOVE, len(callbacks.MODES), 7, 0),
+])
+def test_invalid_data(data):
+    assert callbacks.decode(data) is None
+
+
+def test_seeded_handle():
+    handle = callbacks.seeded_handle('s1', 7, 4)
+    assert handle == callbacks.seeded_handle('s1', 7, 4)
+    assert 0 <= handle < 2 ** 32
+    assert handle != callbacks.seeded_handle('s1', 7, 5)
+    assert handle != callbacks.seeded_handle('s2', 7, 4)
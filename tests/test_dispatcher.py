@@ -0,0 +1,160 @@
+import threading
+import time
+
+import pytest
+from telebot.apihelper import ApiTelegramException
+
+from dispatcher import Dispatcher
+
+
+def telegram_error(code, description, retry_after=None):
+    result_json = {'ok': False, 'error_code': code, 'description': description}
+    if retry_after is not None:
+        result_json['parameters'] = {'retry_after': retry_after}
+    return ApiTelegramException('editMessageText', None, result_json)
+
+
+class FakeBot:
+    # Records every request; errors are raised by the matching calls, and
+    # hold makes a call wait until release() so later requests queue behind it.
+    def __init__(self, errors=(), hold=False):
+        self.errors = list(errors)
+        self.calls = []
+        self.started = threading.Event()
+        self.gate = threading.Event()
+        if not hold:
+            self.gate.set()
+
+    def release(self):
+        self.gate.set()
+
+    def _call(self, method, kwargs):
+        self.calls.append((time.monotonic(), method, kwargs))
+        self.started.set()
+        self.gate.wait(5)
+        if self.errors:
+            error = self.errors.pop(0)
+            if error is not None:
+                raise error
+
+    def send_message(self, **kwargs):
+        self._call('send_message', kwargs)
+
+    def edit_message_text(self, **kwargs):
+        self._call('edit_message_text', kwargs)
+
+    def texts(self):
+        return [kwargs['text'] for _, _, kwargs in self.calls]
+
+
+@pytest.fixture
+def make_dispatcher():
+    dispatchers = []
+
+    def make(bot, **kwargs):
+        kwargs.setdefault('chat_interval', 0)
+        kwargs.setdefault('global_rate', 0)
+        dispatcher = Dispatcher(bot, **kwargs)
+        dispatcher.start()
+        dispatchers.append(dispatcher)
+        return dispatcher
+
+    yield make
+    for dispatcher in dispatchers:
+        dispatcher.close(timeout=1)
+
+
+def test_queued_edits_are_merged(make_dispatcher):
+    bot = FakeBot(hold=True)
+    dispatcher = make_dispatcher(bot)
+    dispatcher.edit_message_text('1', chat_id=1, message_id=10)
+    assert bot.started.wait(5)
+    for text in '234':
+        dispatcher.edit_message_text(text, chat_id=1, message_id=10)
+    assert dispatcher.pending() == 2
+    bot.release()
+    assert dispatcher.flush(5)
+    assert bot.texts() == ['1', '4']
+    assert (dispatcher.sent, dispatcher.coalesced) == (2, 2)
+
+
+def test_edits_of_other_messages_are_kept(make_dispatcher):
+    bot = FakeBot(hold=True)
+    dispatcher = make_dispatcher(bot, workers=1)
+    dispatcher.edit_message_text('a', chat_id=1, message_id=10)
+    assert bot.started.wait(5)
+    dispatcher.edit_message_text('b', chat_id=1, message_id=11)
+    dispatcher.edit_message_text('c', inline_message_id='inline')
+    dispatcher.send_message(1, 'd')
+    dispatcher.send_message(1, 'e')
+    bot.release()
+    assert dispatcher.flush(5)
+    assert sorted(bot.texts()) == ['a', 'b', 'c', 'd', 'e']
+    assert dispatcher.coalesced == 0
+
+
+def test_chat_is_sent_in_order_and_spaced(make_dispatcher):
+    bot = FakeBot()
+    dispatcher = make_dispatcher(bot, chat_interval=0.1)
+    for text in 'abc':
+        dispatcher.send_message(1, text)
+    assert dispatcher.flush(5)
+    assert bot.texts() == ['a', 'b', 'c']
+    times = [sent_at for sent_at, _, _ in bot.calls]
+    assert all(later - earlier >= 0.09 for earlier, later in zip(times, times[1:]))
+
+
+def test_too_many_requests_is_retried_after_wait(make_dispatcher):
+    bot = FakeBot(errors=[telegram_error(429, 'Too Many Requests', retry_after=0.2)])
+    dispatcher = make_dispatcher(bot)
+    dispatcher.edit_message_text('1', chat_id=1, message_id=10)
+    assert dispatcher.flush(5)
+    assert bot.texts() == ['1', '1']
+    assert bot.calls[1][0] - bot.calls[0][0] >= 0.19
+    assert (dispatcher.sent, dispatcher.retried, dispatcher.failed) == (1, 1, 0)
+
+
+def test_too_many_requests_is_not_retried_when_replaced(make_dispatcher):
+    bot = FakeBot(errors=[telegram_error(429, 'Too Many Requests', retry_after=0.05)], hold=True)
+    dispatcher = make_dispatcher(bot)
+    dispatcher.edit_message_text('old', chat_id=1, message_id=10)
+    assert bot.started.wait(5)
+    dispatcher.edit_message_text('new', chat_id=1, message_id=10)
+    bot.release()
+    assert dispatcher.flush(5)
+    assert bot.texts() == ['old', 'new']
+    assert (dispatcher.sent, dispatcher.retried) == (1, 1)
+
+
+def test_server_errors_are_retried_then_given_up(make_dispatcher, monkeypatch):
+    monkeypatch.setattr('dispatcher.RETRY_BACKOFF', 0.01)
+    errors = []
+    bot = FakeBot(errors=[telegram_error(502, 'Bad Gateway')] * 3)
+    dispatcher = make_dispatcher(bot, max_retries=2, on_error=lambda *args: errors.append(args))
+    dispatcher.send_message(1, 'hi')
+    assert dispatcher.flush(5)
+    assert len(bot.calls) == 3
+    assert (dispatcher.sent, dispatcher.retried, dispatcher.failed) == (0, 2, 1)
+    [(method, kwargs, error)] = errors
+    assert (method, kwargs['text'], error.error_code) == ('send_message', 'hi', 502)
+
+
+def test_client_errors_are_not_retried(make_dispatcher):
+    errors = []
+    bot = FakeBot(errors=[telegram_error(400, 'Bad Request: message is not modified'), telegram_error(403, 'Forbidden')])
+    dispatcher = make_dispatcher(bot, workers=1, on_error=lambda *args: errors.append(args))
+    dispatcher.edit_message_text('same', chat_id=1, message_id=10)
+    dispatcher.send_message(2, 'blocked')
+    assert dispatcher.flush(5)
+    assert len(bot.calls) == 2
+    assert (dispatcher.retried, dispatcher.failed) == (0, 1)
+    assert [error.error_code for _, _, error in errors] == [403]
+
+
+def test_flush_times_out(make_dispatcher):
+    bot = FakeBot(hold=True)
+    dispatcher = make_dispatcher(bot)
+    dispatcher.send_message(1, 'hi')
+    assert not dispatcher.flush(0.05)
+    bot.release()
+    assert dispatcher.flush(5)
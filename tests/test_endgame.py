@@ -0,0 +1,61 @@
+import pytest
+
+from bitboard import apply_move, get_flips, get_moves, iter_squares, popcount
+from endgame import EndgameSolver, EndgameTimeout
+from search import Searcher
+
+
+def brute_force(own, opp):
+    # Final disc difference with perfect play and no pruning.
+    moves = get_moves(own, opp)
+    if not moves:
+        if not get_moves(opp, own):
+            return popcount(own) - popcount(opp)
+        return -brute_force(opp, own)
+    return max(
+        -brute_force(new_opp, new_own)
+        for new_own, new_opp in (apply_move(own, opp, sq, get_flips(own, opp, sq)) for sq in iter_squares(moves))
+    )
+
+
+def empties(own, opp):
+    return 64 - popcount(own | opp)
+
+
+@pytest.fixture(scope='module')
+def endgames(positions):
+    # Two positions for each count of 1 to 8 empties.
+    found = {}
+    for own, opp in positions:
+        same = found.setdefault(empties(own, opp), [])
+        if len(same) < 2:
+            same.append((own, opp))
+    return [position for count in range(1, 9) for position in found[count]]
+
+
+def test_solver_matches_brute_force(endgames):
+    solver = EndgameSolver()
+    for own, opp in endgames:
+        score, move = solver.solve(own, opp)
+        assert score == brute_force(own, opp)
+        new_own, new_opp = apply_move(own, opp, move, get_flips(own, opp, move))
+        assert -brute_force(new_opp, new_own) == score
+
+
+def test_search_hands_endgames_to_the_solver(endgames):
+    for own, opp in endgames[::3]:
+        searcher = Searcher(time_limit=0, max_depth=2, endgame_empties=8)
+        searcher.search(own, opp)
+        assert searcher.solved
+        assert searcher.score == brute_force(own, opp)
+
+
+def test_no_moves():
+    assert EndgameSolver().solve((1 << 64) - 1, 0) == (None, None)
+
+
+def test_timeout(positions):
+    own, opp = next((own, opp) for own, opp in positions if empties(own, opp) == 20)
+    solver = EndgameSolver(time_limit=1e-6)
+    with pytest.raises(EndgameTimeout):
+        solver.solve(own, opp)
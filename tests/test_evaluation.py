@@ -0,0 +1,65 @@
+import pytest
+
+import evaluation
+from evaluation import DEFAULT_WEIGHTS, FEATURES, WEIGHTS, Evaluator, squares, squares_batch
+from search import WIN_SCORE, final_score
+
+ALL_FEATURES = {name: 1 for name in FEATURES}
+
+
+def test_squares_batch_without_numpy(positions, monkeypatch):
+    monkeypatch.setattr(evaluation, 'np', None)
+    assert squares_batch(positions) == [squares(own, opp) for own, opp in positions]
+
+
+def test_squares_batch_with_numpy(positions):
+    pytest.importorskip('numpy')
+    assert evaluation.np is not None
+    assert squares_batch(positions) == [squares(own, opp) for own, opp in positions]
+    assert squares_batch(positions[:1]) == [squares(*positions[0])]
+    assert squares_batch([]) == []
+
+
+@pytest.mark.parametrize('weights', [None, ALL_FEATURES, {'squares': 0, 'mobility': 3}])
+@pytest.mark.parametrize('numpy', [True, False])
+def test_evaluate_batch_matches_single_calls(positions, weights, numpy, monkeypatch):
+    if numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(evaluation, 'np', None)
+    evaluator = Evaluator(weights)
+    assert evaluator.evaluate_batch(positions) == [evaluator(own, opp) for own, opp in positions]
+
+
+def test_scores_are_from_the_side_to_move(positions):
+    # Parity only counts empties; every other feature changes sign with the side.
+    evaluator = Evaluator(dict(ALL_FEATURES, parity=0))
+    for own, opp in positions:
+        assert evaluator(own, opp) == -evaluator(opp, own)
+
+
+def test_unknown_feature():
+    with pytest.raises(ValueError):
+        Evaluator({'squares': 1, 'corners': 5})
+
+
+def max_evaluation(weights):
+    # Every feature other than squares and parity is a difference of two disc
+    # or move counts, so at most 64 in size.
+    bound = abs(weights.get('squares', 0)) * sum(abs(weight) for weight in WEIGHTS)
+    for name, weight in weights.items():
+        if name == 'parity':
+            bound += abs(weight)
+        elif name != 'squares':
+            bound += abs(weight) * 64
+    return bound
+
+
+def test_win_scores_outrank_any_evaluation(positions):
+    bound = max_evaluation(DEFAULT_WEIGHTS)
+    narrow_win = final_score((1 << 33) - 1, (1 << 64) - (1 << 33))
+    narrow_loss = final_score((1 << 31) - 1, (1 << 64) - (1 << 31))
+    assert narrow_win > bound and narrow_loss < -bound
+    assert final_score((1 << 32) - 1, (1 << 64) - (1 << 32)) == 0
+    evaluator = Evaluator()
+    assert max(abs(evaluator(own, opp)) for own, opp in positions) < WIN_SCORE
@@ -0,0 +1,77 @@
+from matchmaking import Matchmaker, Ticket
+
+
+def ticket(user_id, rating):
+    return Ticket(user_id, f'player {user_id}', user_id, 100 + user_id, rating)
+
+
+def test_close_ratings_match_at_once():
+    matchmaker = Matchmaker()
+    first = ticket(1, 1000)
+    assert matchmaker.enqueue(first, now=0) is None
+    assert matchmaker.enqueue(ticket(2, 1050), now=1) is first
+    assert len(matchmaker) == 0
+
+
+def test_band_widens_while_waiting():
+    matchmaker = Matchmaker(base_band=100, widen_per_second=5)
+    low, high = ticket(1, 1000), ticket(2, 1300)
+    assert matchmaker.enqueue(low, now=0) is None
+    assert matchmaker.enqueue(high, now=10) is None
+    # low's band reaches 300 after 40 seconds.
+    assert matchmaker.sweep(now=39) == ([], [])
+    assert matchmaker.sweep(now=40) == ([(low, high)], [])
+    assert len(matchmaker) == 0
+
+
+def test_band_stops_at_max_band():
+    matchmaker = Matchmaker(timeout=300, widen_per_second=5, max_band=600)
+    assert matchmaker.enqueue(ticket(1, 1000), now=0) is None
+    assert matchmaker.enqueue(ticket(2, 1700), now=0) is None
+    assert matchmaker.sweep(now=299) == ([], [])
+    assert len(matchmaker) == 2
+
+
+def test_closest_rating_is_preferred():
+    matchmaker = Matchmaker(base_band=100, widen_per_second=5)
+    assert matchmaker.enqueue(ticket(1, 900), now=0) is None
+    closer = ticket(2, 1100)
+    assert matchmaker.enqueue(closer, now=0) is None
+    # At 5 seconds both are in range (110 within 125, 90 within 125).
+    assert matchmaker.enqueue(ticket(3, 1010), now=5) is closer
+    assert matchmaker.is_queued(1)
+
+
+def test_tickets_time_out():
+    matchmaker = Matchmaker(timeout=300)
+    first, second = ticket(1, 1000), ticket(2, 2000)
+    matchmaker.enqueue(first, now=0)
+    matchmaker.enqueue(second, now=100)
+    assert matchmaker.sweep(now=300) == ([], [first])
+    assert not matchmaker.is_queued(1)
+    assert matchmaker.sweep(now=400) == ([], [second])
+    assert len(matchmaker) == 0
+
+
+def test_cancelled_ticket_is_not_matched_or_timed_out():
+    matchmaker = Matchmaker(timeout=300)
+    first = ticket(1, 1000)
+    matchmaker.enqueue(first, now=0)
+    assert matchmaker.cancel(1) is first
+    assert matchmaker.cancel(1) is None
+    assert matchmaker.enqueue(ticket(2, 1000), now=1) is None
+    assert matchmaker.sweep(now=300) == ([], [])
+
+
+def test_enqueue_twice_keeps_one_ticket():
+    matchmaker = Matchmaker()
+    assert matchmaker.enqueue(ticket(1, 1000), now=0) is None
+    assert matchmaker.enqueue(ticket(1, 1000), now=1) is None
+    assert len(matchmaker) == 1
+
+
+def test_without_ratings_anyone_matches_oldest_first():
+    matchmaker = Matchmaker(use_ratings=False)
+    first = ticket(1, 0)
+    matchmaker.enqueue(first, now=0)
+    assert matchmaker.enqueue(ticket(2, 3000), now=1) is first
@@ -0,0 +1,26 @@
+from metrics import Metrics
+
+
+def test_render_types():
+    metrics = Metrics(enabled=True, buckets=(0.1, 1.0))
+    metrics.inc('errors_total', where='poll')
+    metrics.inc('errors_total', 2, where='poll')
+    metrics.observe('handler_seconds', 0.5)
+    metrics.gauge('live_games', lambda: 3)
+    metrics.counter('outbox_sent_total', lambda: 7)
+    metrics.gauge('broken', lambda: 1 / 0)
+    lines = metrics.render().splitlines()
+    assert lines[:2] == ['# TYPE errors_total counter', 'errors_total{where="poll"} 3']
+    assert '# TYPE handler_seconds histogram' in lines
+    assert 'handler_seconds_bucket{le="1.0"} 1' in lines
+    assert 'handler_seconds_count 1' in lines
+    assert lines[-4:] == ['# TYPE live_games gauge', 'live_games 3', '# TYPE outbox_sent_total counter', 'outbox_sent_total 7']
+
+
+def test_disabled_records_nothing():
+    metrics = Metrics()
+    metrics.inc('errors_total')
+    with metrics.timer('handler_seconds'):
+        pass
+    assert metrics.render() == '\n'
+    assert metrics.summary() == ''
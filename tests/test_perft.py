@@ -0,0 +1,52 @@
+import pytest
+
+from benchmark import POSITIONS, load_position
+from bitboard import START_BLACK, START_WHITE
+from perft import KNOWN_COUNTS, divide, parallel_perft, perft, perft_game
+
+# Black b1 against white a1: black has no move and passes, white takes c1
+# and the game is over.
+FORCED_PASS = (1 << 1, 1 << 0)
+GAME_OVER = (0xffffffffffffffff, 0)
+
+
+@pytest.mark.parametrize('depth', range(1, 8))
+def test_start_position_counts(depth):
+    assert perft(START_BLACK, START_WHITE, depth) == KNOWN_COUNTS[depth]
+
+
+def test_game_api_matches_start_counts():
+    assert perft_game(load_position(START_BLACK, START_WHITE, True), 5) == KNOWN_COUNTS[5]
+
+
+@pytest.mark.parametrize('name, black, white, black_to_move', POSITIONS, ids=[p[0] for p in POSITIONS])
+def test_game_api_matches_bitboards(name, black, white, black_to_move):
+    game = load_position(black, white, black_to_move)
+    own, opp = game._bitboards(game.current_player)
+    before = game.to_compact()
+    assert perft_game(game, 3) == perft(own, opp, 3)
+    assert game.to_compact() == before
+
+
+def test_forced_pass():
+    own, opp = FORCED_PASS
+    assert [perft(own, opp, depth) for depth in range(4)] == [1, 1, 1, 1]
+    assert divide(own, opp, 2) == {None: 1}
+    game = load_position(own, opp, True)
+    assert [perft_game(game, depth) for depth in range(4)] == [1, 1, 1, 1]
+    assert game.current_player == game.player_black
+
+
+def test_game_over():
+    own, opp = GAME_OVER
+    for depth in range(4):
+        assert perft(own, opp, depth) == 1
+        assert perft_game(load_position(own, opp, True), depth) == 1
+        assert divide(own, opp, depth) == {None: 1}
+
+
+def test_divide_sums_to_perft():
+    counts = divide(START_BLACK, START_WHITE, 4)
+    assert len(counts) == 4
+    assert sum(counts.values()) == KNOWN_COUNTS[4]
+    assert parallel_perft(START_BLACK, START_WHITE, 5, workers=2) == KNOWN_COUNTS[5]
@@ -0,0 +1,116 @@
+import pytest
+
+from benchmark import POSITIONS
+from bitboard import apply_move, get_flips, get_moves, iter_squares
+from evaluation import Evaluator
+from search import Searcher, final_score
+from transposition import EXACT, LOWER, UPPER, TranspositionTable, game_table, zobrist_hash
+
+FIXED = [(black, white) if black_to_move else (white, black) for _, black, white, black_to_move in POSITIONS]
+
+
+def minimax(own, opp, depth, evaluator):
+    # Plain negamax without pruning, with the search's pass and game-over rules.
+    if depth == 0:
+        return evaluator(own, opp)
+    moves = get_moves(own, opp)
+    if not moves:
+        if not get_moves(opp, own):
+            return final_score(own, opp)
+        return -minimax(opp, own, depth - 1, evaluator)
+    return max(
+        -minimax(new_opp, new_own, depth - 1, evaluator)
+        for new_own, new_opp in (apply_move(own, opp, sq, get_flips(own, opp, sq)) for sq in iter_squares(moves))
+    )
+
+
+def fixed_depth_search(own, opp, depth, **options):
+    searcher = Searcher(time_limit=0, max_depth=depth, endgame_empties=0, **options)
+    move = searcher.search(own, opp)
+    return searcher, move
+
+
+def sample(positions):
+    return positions[5::40]
+
+
+@pytest.mark.parametrize('depth', [1, 2, 3, 4])
+def test_alpha_beta_matches_minimax(depth):
+    evaluator = Evaluator()
+    for own, opp in FIXED:
+        searcher, move = fixed_depth_search(own, opp, depth)
+        assert searcher.depth_reached == depth
+        assert searcher.score == minimax(own, opp, depth, evaluator)
+        new_own, new_opp = apply_move(own, opp, move, get_flips(own, opp, move))
+        assert -minimax(new_opp, new_own, depth - 1, evaluator) == searcher.score
+
+
+def test_alpha_beta_matches_minimax_on_playouts(positions):
+    evaluator = Evaluator()
+    for own, opp in sample(positions):
+        searcher, _ = fixed_depth_search(own, opp, 3)
+        assert searcher.score == minimax(own, opp, min(3, searcher.depth_reached), evaluator)
+
+
+def test_batched_leaves_give_the_same_score():
+    for own, opp in FIXED:
+        plain, _ = fixed_depth_search(own, opp, 3)
+        batched, _ = fixed_depth_search(own, opp, 3, batch_leaves=True)
+        assert batched.score == plain.score
+
+
+def test_no_moves():
+    full = (1 << 64) - 1
+    assert Searcher(time_limit=0, max_depth=3).search(full, 0) is None
+
+
+class NoTable(TranspositionTable):
+    # Remembers nothing, so every node is searched in full.
+    def probe(self, key):
+        return None
+
+
+def test_table_bounds_keep_the_root_score(positions):
+    bounds = set()
+    for own, opp in FIXED + sample(positions):
+        table = TranspositionTable()
+        cached, _ = fixed_depth_search(own, opp, 4, tt=table)
+        uncached, _ = fixed_depth_search(own, opp, 4, tt=NoTable())
+        assert cached.score == uncached.score
+        # The next search reuses the table, as the next move of a game does.
+        again, _ = fixed_depth_search(own, opp, 4, tt=table)
+        assert again.score == cached.score
+        bounds.update(entry[2] for entry in table.entries if entry is not None)
+    assert bounds == {EXACT, LOWER, UPPER}
+
+
+def test_table_replacement():
+    table = TranspositionTable(size=4)
+    table.new_search()
+    table.store(1, 5, EXACT, 10, 3)
+    table.store(5, 2, LOWER, 20, 4)
+    assert table.probe(1)[1:5] == (5, EXACT, 10, 3)
+    assert table.probe(5) is None
+    table.new_search()
+    table.store(5, 2, LOWER, 20, 4)
+    assert table.probe(5)[1:5] == (2, LOWER, 20, 4)
+    assert table.probe(1) is None
+    with pytest.raises(ValueError):
+        TranspositionTable(size=3)
+
+
+def test_zobrist_hash_tells_sides_apart():
+    own, opp = FIXED[0]
+    assert zobrist_hash(own, opp) == zobrist_hash(own, opp)
+    assert zobrist_hash(own, opp) != zobrist_hash(opp, own)
+
+
+def test_game_tables_are_kept_per_game(monkeypatch):
+    monkeypatch.setattr('transposition.GAME_TABLES', 2)
+    first = game_table('first')
+    assert game_table('first') is first
+    second = game_table('second')
+    game_table('first')
+    game_table('third')
+    assert game_table('first') is first
+    assert game_table('second') is not second
@@ -0,0 +1,64 @@
+import pytest
+
+from game import Othello
+from snapshots import SnapshotStore, decode_game, encode_game
+
+
+def played_game():
+    game = Othello(player1_id=7, player1_name='Ana', player2_id=-1001, player2_name='Jürgen ♟')
+    game.make_move(2, 3, game.player_black)
+    game.make_move(2, 2, game.player_white)
+    game.make_move(3, 2, game.player_black)
+    return game
+
+
+def assert_same_game(restored, game):
+    assert restored.to_compact() == game.to_compact()
+    assert restored.current_player == game.current_player
+    assert (restored.player1_id, restored.player1_name) == (game.player1_id, game.player1_name)
+    assert (restored.player2_id, restored.player2_name) == (game.player2_id, game.player2_name)
+
+
+@pytest.mark.parametrize('mode, refs, inline_message_id', [
+    ('ai', [(7, 4)], None),
+    ('rnd', [(7, 4), (-1001, 2 ** 40)], None),
+    ('2p', [], 'AgAAAJ8xAQBn9jVm'),
+])
+def test_round_trip(mode, refs, inline_message_id):
+    game = played_game()
+    restored, restored_mode, restored_refs, restored_inline = decode_game(encode_game(game, mode, refs, inline_message_id))
+    assert_same_game(restored, game)
+    assert (restored_mode, restored_refs, restored_inline) == (mode, refs, inline_message_id)
+
+
+def test_round_trip_without_players():
+    game = Othello()
+    restored, _, _, _ = decode_game(encode_game(game, 'ai'))
+    assert_same_game(restored, game)
+    assert restored.player1_id is None and restored.player2_name is None
+
+
+@pytest.mark.parametrize('data', [
+    b'',
+    encode_game(played_game(), 'ai', [(7, 4)])[:-5],
+    b'\x02' + encode_game(played_game(), 'ai')[1:],
+    b'\x01\x09' + encode_game(played_game(), 'ai')[2:],
+])
+def test_bad_data_raises_value_error(data):
+    with pytest.raises(ValueError):
+        decode_game(data)
+
+
+def test_store_keeps_latest_state(tmp_path):
+    path = str(tmp_path / 'snapshots.db')
+    store = SnapshotStore(path)
+    assert store.load() == {}
+    store.save(1, b'first')
+    store.save(1, b'second')
+    store.save(2, b'gone')
+    store.delete(2)
+    store.close()
+
+    store = SnapshotStore(path)
+    assert store.load() == {1: b'second'}
+    store.close()
@@ -0,0 +1,44 @@
+import threading
+
+from scheduler import Scheduler, run_task
+from workers import ShardedExecutor
+
+
+def fail():
+    raise RuntimeError("boom")
+
+
+def test_run_task_reports_errors(capsys):
+    errors = []
+    run_task(fail, (), lambda func, error: errors.append((func, str(error))))
+    assert errors == [(fail, "boom")]
+    run_task(fail, ())
+    assert capsys.readouterr().out == "Error in fail: boom\n"
+
+
+def test_tasks_of_one_key_run_in_order():
+    errors = []
+    executor = ShardedExecutor(4, on_error=lambda func, error: errors.append(str(error)))
+    seen = {key: [] for key in range(8)}
+    for i in range(50):
+        for key in seen:
+            executor.submit(key, seen[key].append, i)
+    executor.submit(3, fail)
+    executor.start()
+    executor.shutdown()
+    assert all(values == list(range(50)) for values in seen.values())
+    assert errors == ["boom"]
+
+
+def test_scheduler_runs_calls_in_time_order():
+    done = threading.Event()
+    calls = []
+    scheduler = Scheduler(workers=1)
+    scheduler.call_later(0.05, calls.append, 'late')
+    cancelled = scheduler.call_later(0.01, calls.append, 'cancelled')
+    scheduler.call_soon(calls.append, 'soon')
+    scheduler.call_later(0.1, done.set)
+    scheduler.cancel(cancelled)
+    assert done.wait(5)
+    scheduler.shutdown()
+    assert calls == ['soon', 'late']